@@ -1,13 +1,12 @@
 import os
 import re
 import torch
-import pandas as pd
 from collections import defaultdict
 from keybert import KeyBERT
 from konlpy.tag import Okt
 from kobert_tokenizer import KoBERTTokenizer
 from transformers import BertForSequenceClassification, AutoTokenizer, BertModel
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 import torch.nn as nn
 
 # 모델 로드
@@ -66,15 +65,34 @@ category_to_file = {
 
 os.makedirs("cached_embeddings", exist_ok=True)   # 캐시 폴더
 
+# 임베딩 인덱스에 함께 저장되는 상품 메타데이터 컬럼
+STORE_COLUMNS = ["name", "price", "brand", "image_url", "product_url"]
+
 # 기능 함수
 with open("stopwords-ko.txt", encoding="utf-8") as f:
     stopwords = set(line.strip() for line in f if line.strip())
 
+# 상품 임베딩 인덱스 (행렬 + 컬럼형 메타데이터)
+def to_matrix_store(data):
+    """
+    product_embeddings.py 결과 → {"embeddings": 정규화된 [N, D] 행렬, "name": [...], ...}
+    예전 형식(상품 dict 리스트)도 받아서 같은 행렬 형식으로 바꿔 준다.
+    """
+    if isinstance(data, dict):
+        return data
+    if not data:
+        return None
+    embeddings = torch.stack([torch.as_tensor(p["embedding"], dtype=torch.float32).cpu() for p in data])
+    store = {"embeddings": torch.nn.functional.normalize(embeddings, dim=1)}
+    for col in STORE_COLUMNS:
+        store[col] = [p.get(col, "") for p in data]
+    return store
+
 # 상품 임베딩 캐싱
 def load_or_build_embeddings(category: str, intimacy_score: float):
     csv_path = category_to_file.get(category)
     if not csv_path:
-        return []
+        return None
     if intimacy_score < 2:
         suffix = "_2"
     elif intimacy_score < 3:
@@ -88,16 +106,16 @@ def load_or_build_embeddings(category: str, intimacy_score: float):
     cache_path = f"cached_embeddings/{base_name}{suffix}.pt"
 
     if os.path.exists(cache_path):
-        return torch.load(cache_path)
+        return to_matrix_store(torch.load(cache_path))
 
     # 존재하지 않으면 기본 캐시로 fallback
     fallback_path = f"cached_embeddings/{base_name}.pt"
     if os.path.exists(fallback_path):
         print(f"[!] {cache_path} 없음 → {fallback_path} 사용")
-        return torch.load(fallback_path)
+        return to_matrix_store(torch.load(fallback_path))
 
     print(f"[!] 캐시 없음: {cache_path} / {fallback_path}")
-    return []
+    return None
 
 # 관심 분류 배치
 def classify_interest_batch(sentences):
@@ -195,15 +213,23 @@ def extract_interest_weighted_keywords(sentences):
     filtered = [(k, v) for k, v in keyword_scores.items() if all(not re.search(r"(다|어|지|음)$", t) for t in k.split())]
     return sorted(filtered, key=lambda x: x[1], reverse=True)
 
-def recommend_products_from_keywords(sorted_keywords, allowed_category, intimacy_score):
-    products = load_or_build_embeddings(allowed_category, intimacy_score)
-    if not products:
+def rank_products(store, query, top_k=5):
+    """
+    쿼리 임베딩과 상품 행렬을 한 번의 행렬-벡터 곱으로 비교 → 상위 top_k (인덱스, 유사도)
+    """
+    q_emb = embedding_model.encode(query, convert_to_tensor=True, normalize_embeddings=True)
+    scores = store["embeddings"] @ q_emb.to(store["embeddings"].device, torch.float32)
+    k = min(top_k, scores.shape[0])
+    top = torch.topk(scores, k)
+    return list(zip(top.indices.tolist(), top.values.tolist()))
+
+def recommend_products_from_keywords(sorted_keywords, allowed_category, intimacy_score, top_k=5):
+    store = load_or_build_embeddings(allowed_category, intimacy_score)
+    if store is None or len(store["name"]) == 0:
         return []
 
     query = " ".join([kw for kw, _ in sorted_keywords[:5]])
-    q_emb = embedding_model.encode(query, convert_to_tensor=True)
-    scores = [(p["name"], util.cos_sim(q_emb, p["embedding"]).item()) for p in products]
-    return sorted(scores, key=lambda x: x[1], reverse=True)
+    return [(store["name"][idx], sc) for idx, sc in rank_products(store, query, top_k)]
 
 if __name__ == "__main__":
     file_path = "chat_exam.txt"
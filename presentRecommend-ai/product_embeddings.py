@@ -1,11 +1,44 @@
-import os, pandas as pd, torch
-from sentence_transformers import SentenceTransformer
+import os
+import time
+import hashlib
+import argparse
+import pandas as pd
+import torch
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 
-embedding_model = SentenceTransformer("jhgan/ko-sroberta-multitask")
+# 카테고리 CSV → 행렬 형식 임베딩 인덱스 (.pt): 정규화된 [N, D] 임베딩 + 컬럼별 메타데이터
+# - keywords 를 큰 배치로 한 번에 인코딩 (행 단위 encode 없음), 컬럼은 통째로 읽는다
+# - 행마다 keywords 해시를 함께 저장해 두고, 다시 빌드할 때 새로 생기거나 바뀐 행만 인코딩한다
+# - 카테고리 파일 여러 개를 워커 프로세스에 나눠 병렬로 처리 (워커마다 모델 하나)
+# 사용법: python product_embeddings.py [--input category_files] [--output cached_embeddings_2] [--workers 2] [--force]
 
-input_dir = "category_files"
-output_dir = "cached_embeddings_2"
-os.makedirs(output_dir, exist_ok=True)
+EMBEDDING_MODEL = "jhgan/ko-sroberta-multitask"
+INPUT_DIR = "category_files"
+OUTPUT_DIR = "cached_embeddings_2"
+BATCH_SIZE = 256
+
+COLUMN_SOURCES = {
+    "name": ["상품명"],
+    "price": ["가격"],
+    "brand": ["브랜드"],
+    "image_url": ["image_url", "이미지URL"],
+    "product_url": ["product_url", "상품URL"],
+}
+
+_model = None
+
+def get_model():
+    # 워커 프로세스마다 한 번만 로드 (바뀐 행이 없는 파일만 맡은 워커는 로드하지 않음)
+    global _model
+    if _model is None:
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(EMBEDDING_MODEL)
+    return _model
+
+def init_worker(threads):
+    # 워커 여러 개가 코어를 나눠 쓰도록 intra-op 스레드 수 제한
+    torch.set_num_threads(threads)
 
 def read_csv_flexible(path):
     try:
@@ -13,39 +46,138 @@ def read_csv_flexible(path):
     except UnicodeDecodeError:
         return pd.read_csv(path, encoding="cp949")
 
-for filename in os.listdir(input_dir):
-    if not filename.endswith(".csv"):
-        continue
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def keyword_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
 
-    safe_key = os.path.splitext(filename)[0]
-    pt_path = os.path.join(output_dir, f"{safe_key}.pt")
-    if os.path.exists(pt_path):
-        print(f"[▶] Skipping {safe_key}, already cached.")
-        continue
+def read_column(df, names):
+    for name in names:
+        if name in df.columns:
+            return df[name].astype(object).where(df[name].notna(), "").tolist()
+    return [""] * len(df)
+
+def load_previous(pt_path, force):
+    """
+    기존 인덱스 → (store, {keywords 해시: 행 번호}). 예전 형식이거나 모델이 바뀌었으면 재사용하지 않는다.
+    """
+    if force or not os.path.exists(pt_path):
+        return None, {}
+    try:
+        store = torch.load(pt_path)
+    except Exception as e:
+        print(f"[!] {pt_path} 읽기 실패 → 전체 다시 임베딩 ({e})")
+        return None, {}
+    if not isinstance(store, dict) or "keyword_hash" not in store or store.get("model") != EMBEDDING_MODEL:
+        print(f"[!] {pt_path}: 해시 정보가 없는 예전 인덱스 → 전체 다시 임베딩")
+        return None, {}
+    return store, {h: i for i, h in enumerate(store["keyword_hash"])}
+
+def build_category(csv_path, pt_path, batch_size=BATCH_SIZE, force=False):
+    start = time.perf_counter()
+    stats = {"file": os.path.basename(csv_path), "products": 0, "encoded": 0, "reused": 0, "status": "built"}
+    source_hash = file_hash(csv_path)
+    previous, previous_rows = load_previous(pt_path, force)
+    if previous is not None and previous.get("source_sha256") == source_hash:
+        stats.update(products=len(previous["keyword_hash"]), reused=len(previous["keyword_hash"]), status="unchanged")
+        stats["seconds"] = time.perf_counter() - start
+        return stats
 
-    csv_path = os.path.join(input_dir, filename)
     try:
         df = read_csv_flexible(csv_path)
     except Exception as e:
-        print(f"[!] Failed to read {csv_path} → {e}")
-        continue
-
-    product_list = []
-    for _, row in df.iterrows():
-        if pd.isna(row.get("keywords")) or pd.isna(row.get("상품명")):
-            continue
-
-        product = {
-            "name": row["상품명"],
-            "keywords": row["keywords"],
-            "price": row.get("가격", ""),
-            "category": row.get("대분류", ""),
-            "brand": row.get("브랜드", ""),
-            "image_url": row.get("image_url", ""),
-            "product_url": row.get("product_url", "")
-        }
-        product["embedding"] = embedding_model.encode(product["keywords"], convert_to_tensor=True)
-        product_list.append(product)
-
-    torch.save(product_list, pt_path)
-    print(f"[✓] Saved {len(product_list):>5} items → {pt_path}")
+        stats.update(status=f"failed: {e}", seconds=time.perf_counter() - start)
+        return stats
+    if "keywords" not in df.columns or "상품명" not in df.columns:
+        stats.update(status="failed: keywords/상품명 컬럼 없음", seconds=time.perf_counter() - start)
+        return stats
+    df = df.dropna(subset=["keywords", "상품명"])
+    if df.empty:
+        stats.update(status="empty", seconds=time.perf_counter() - start)
+        return stats
+
+    keywords = df["keywords"].astype(str).tolist()
+    hashes = [keyword_hash(text) for text in keywords]
+
+    # 이전 인덱스에 없는 keywords 만 (파일 안 중복 제거 후) 인코딩
+    missing = {}
+    for text, h in zip(keywords, hashes):
+        if h not in previous_rows and h not in missing:
+            missing[h] = text
+    new_rows = {}
+    if missing:
+        encoded = get_model().encode(list(missing.values()), batch_size=batch_size, convert_to_tensor=True,
+                                     show_progress_bar=False).cpu().float()
+        encoded = torch.nn.functional.normalize(encoded, dim=1)
+        new_rows = {h: encoded[i] for i, h in enumerate(missing)}
+
+    if previous is not None and previous_rows:
+        old = previous["embeddings"]
+        embeddings = torch.stack([new_rows[h] if h in new_rows else old[previous_rows[h]] for h in hashes])
+    else:
+        embeddings = torch.stack([new_rows[h] for h in hashes])
+
+    store = {"embeddings": embeddings.contiguous()}
+    for col, names in COLUMN_SOURCES.items():
+        store[col] = read_column(df, names)
+    store.update({"keyword_hash": hashes, "model": EMBEDDING_MODEL, "source_sha256": source_hash})
+
+    tmp_path = pt_path + ".tmp"
+    torch.save(store, tmp_path)
+    os.replace(tmp_path, pt_path)
+
+    stats.update(products=len(hashes), encoded=len(missing), reused=len(hashes) - sum(h in new_rows for h in hashes))
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def report(stats):
+    rate = stats["encoded"] / stats["seconds"] if stats["encoded"] and stats["seconds"] > 0 else 0.0
+    print(f"[{'✓' if stats['status'] in ('built', 'unchanged') else '!'}] {stats['file']:<16} {stats['status']:<10} "
+          f"{stats['products']:>6}개 (인코딩 {stats['encoded']}, 재사용 {stats['reused']}) "
+          f"{stats['seconds']:.2f}s, {rate:.1f} products/s")
+
+def build_all(input_dir=INPUT_DIR, output_dir=OUTPUT_DIR, workers=1, batch_size=BATCH_SIZE, force=False):
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(os.path.join(input_dir, filename), os.path.join(output_dir, os.path.splitext(filename)[0] + ".pt"))
+            for filename in sorted(os.listdir(input_dir)) if filename.endswith(".csv")]
+    # 큰 파일부터 나눠 줘야 마지막에 한 워커만 오래 도는 일이 줄어든다
+    jobs.sort(key=lambda job: os.path.getsize(job[0]), reverse=True)
+
+    start = time.perf_counter()
+    results = []
+    workers = max(1, min(workers, len(jobs)))
+    if workers == 1:
+        for csv_path, pt_path in jobs:
+            results.append(build_category(csv_path, pt_path, batch_size, force))
+            report(results[-1])
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        # fork 대신 spawn: 부모의 torch 스레드 풀 상태를 물려받지 않는다
+        with ProcessPoolExecutor(workers, mp_context=get_context("spawn"),
+                                 initializer=init_worker, initargs=(threads,)) as pool:
+            futures = [pool.submit(build_category, csv_path, pt_path, batch_size, force) for csv_path, pt_path in jobs]
+            for future in futures:
+                results.append(future.result())
+                report(results[-1])
+
+    elapsed = time.perf_counter() - start
+    total = sum(r["products"] for r in results)
+    encoded = sum(r["encoded"] for r in results)
+    print(f"[✓] 전체 {total}개 상품 (인코딩 {encoded}, 재사용 {total - encoded}) {elapsed:.2f}s, "
+          f"{total / elapsed if elapsed > 0 else 0:.1f} products/s (인코딩 기준 {encoded / elapsed if elapsed > 0 else 0:.1f}/s)")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="카테고리 CSV → 상품 임베딩 인덱스 (.pt)")
+    parser.add_argument("--input", default=INPUT_DIR)
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=1, help="카테고리 파일을 병렬로 처리할 프로세스 수")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--force", action="store_true", help="기존 인덱스를 무시하고 전부 다시 임베딩")
+    args = parser.parse_args()
+    build_all(args.input, args.output, args.workers, args.batch_size, args.force)
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# 근사 최근접 이웃(ANN) 인덱스: 전체 카테고리 상품을 한 번에 검색할 때 사용
+# faiss가 설치되어 있으면 IndexIVFFlat, 없으면 순수 NumPy IVF로 동작한다.
+# 임베딩은 정규화되어 있으므로 내적 = 코사인 유사도.
+
+def _topk(scores, k):
+    k = min(k, scores.shape[0])
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+def _normalize(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+def _assign(x, centroids, chunk=65536):
+    return np.concatenate([np.argmax(x[i:i + chunk] @ centroids.T, axis=1) for i in range(0, len(x), chunk)])
+
+def exact_search(embeddings, q, top_k=5):
+    scores = embeddings @ q
+    top = _topk(scores, top_k)
+    return top, scores[top]
+
+class IVFIndex:
+    """
+    순수 NumPy IVF: 구면 k-means로 nlist개 클러스터를 만들고, 질의 시 가까운 nprobe개 리스트만 검색
+    """
+    backend = "numpy"
+
+    def __init__(self, centroids, order, offsets, embeddings):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.embeddings = embeddings
+
+    @property
+    def nlist(self):
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, embeddings, nlist=None, n_iter=10, seed=0):
+        x = np.asarray(embeddings, dtype=np.float32)
+        n = x.shape[0]
+        nlist = min(nlist or max(1, int(np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+
+        sample = x[rng.choice(n, min(n, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            # 빈 클러스터는 이전 중심을 유지
+            centroids = np.where(counts[:, None] > 0, _normalize(sums), centroids)
+
+        assign = _assign(x, centroids)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        return cls(centroids, order, offsets, x)
+
+    def search(self, q, top_k=5, nprobe=8):
+        q = np.asarray(q, dtype=np.float32).reshape(-1)
+        probe = _topk(self.centroids @ q, max(1, nprobe))
+        candidates = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+        scores = self.embeddings[candidates] @ q
+        top = _topk(scores, top_k)
+        return candidates[top], scores[top]
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets)
+        return path
+
+    @classmethod
+    def load(cls, path, embeddings):
+        data = np.load(path)
+        return cls(data["centroids"], data["order"], data["offsets"], np.asarray(embeddings, dtype=np.float32))
+
+class FaissIVFIndex:
+    """
+    faiss IndexIVFFlat (내적) 래퍼. IVFIndex와 같은 build/search/save/load 인터페이스.
+    """
+    backend = "faiss"
+
+    def __init__(self, index):
+        self.index = index
+
+    @property
+    def nlist(self):
+        return self.index.nlist
+
+    @classmethod
+    def build(cls, embeddings, nlist=None, n_iter=10, seed=0):
+        x = np.ascontiguousarray(embeddings, dtype=np.float32)
+        n, dim = x.shape
+        nlist = min(nlist or max(1, int(np.sqrt(n))), n)
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.cp.niter = n_iter
+        index.cp.seed = seed
+        index.train(x)
+        index.add(x)
+        return cls(index)
+
+    def search(self, q, top_k=5, nprobe=8):
+        self.index.nprobe = max(1, nprobe)
+        q = np.ascontiguousarray(np.asarray(q, dtype=np.float32).reshape(1, -1))
+        scores, ids = self.index.search(q, top_k)
+        keep = ids[0] >= 0
+        return ids[0][keep].astype(np.int64), scores[0][keep]
+
+    def save(self, path):
+        faiss.write_index(self.index, path)
+        return path
+
+    @classmethod
+    def load(cls, path, embeddings=None):
+        return cls(faiss.read_index(path))
+
+def index_path(base_path, backend):
+    return base_path + (".ivf.faiss" if backend == "faiss" else ".ivf.npz")
+
+def build_index(embeddings, backend="auto", nlist=None, n_iter=10, seed=0):
+    if backend == "auto":
+        backend = "faiss" if faiss is not None else "numpy"
+    if backend == "faiss" and faiss is None:
+        raise ImportError("faiss가 설치되어 있지 않습니다 (pip install faiss-cpu) → backend='numpy' 사용")
+    cls = FaissIVFIndex if backend == "faiss" else IVFIndex
+    return cls.build(embeddings, nlist=nlist, n_iter=n_iter, seed=seed)
+
+def store_fingerprint(embeddings, names):
+    """
+    인덱스를 만든 통합 인덱스(all_N)의 행 수/차원/상품명 체크섬 → 인덱스와 행 번호가 맞는지 확인용
+    """
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(str(name).encode("utf-8"))
+        digest.update(b"\0")
+    rows, dim = np.shape(embeddings)
+    return {"rows": int(rows), "dim": int(dim), "names_sha256": digest.hexdigest()}
+
+def fingerprint_path(base_path):
+    return base_path + ".ivf.json"
+
+def save_fingerprint(base_path, embeddings, names):
+    with open(fingerprint_path(base_path), "w", encoding="utf-8") as f:
+        json.dump(store_fingerprint(embeddings, names), f)
+
+def load_index(base_path, embeddings, names):
+    """
+    base_path.ivf.faiss (faiss 설치 시) → base_path.ivf.npz 순서로 찾아서 로드. 없으면 None.
+    인덱스를 만든 뒤 all_N 이 다시 만들어져 행이 달라졌으면 (지문 불일치) 틀린 행 번호를 돌려주지 않도록 None.
+    """
+    faiss_path = index_path(base_path, "faiss")
+    numpy_path = index_path(base_path, "numpy")
+    has_faiss = faiss is not None and os.path.exists(faiss_path)
+    if not has_faiss and not os.path.exists(numpy_path):
+        return None
+    try:
+        with open(fingerprint_path(base_path), encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        saved = None
+    if saved != store_fingerprint(embeddings, names):
+        print(f"[!] {base_path} ANN 인덱스가 현재 통합 인덱스와 맞지 않음 → 정확 검색 사용 (python ann_index.py 로 다시 빌드)")
+        return None
+    index = FaissIVFIndex.load(faiss_path) if has_faiss else IVFIndex.load(numpy_path, embeddings)
+    if has_faiss and index.index.ntotal != saved["rows"]:
+        print(f"[!] {faiss_path}: 행 수 불일치 ({index.index.ntotal} != {saved['rows']}) → 정확 검색 사용")
+        return None
+    return index
+
+def recall_at_k(index, embeddings, queries, top_k=5, nprobe=8):
+    """
+    같은 질의에 대해 exact 검색 결과 중 ANN이 찾아낸 비율 + 질의당 평균 지연(ms)
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    hits, total, elapsed = 0, 0, 0.0
+    for q in np.asarray(queries, dtype=np.float32):
+        exact, _ = exact_search(embeddings, q, top_k)
+        start = time.perf_counter()
+        approx, _ = index.search(q, top_k, nprobe)
+        elapsed += time.perf_counter() - start
+        hits += len(set(exact.tolist()) & set(approx.tolist()))
+        total += len(exact)
+    return {
+        "nprobe": nprobe,
+        "recall": round(hits / total, 4) if total else 1.0,
+        "latency_ms": round(elapsed / max(len(queries), 1) * 1000, 3),
+    }
+
+def sample_queries(embeddings, n=200, noise=0.05, seed=0):
+    """
+    저장된 상품 벡터에 잡음을 섞어 recall 측정용 질의를 만든다.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.asarray(embeddings, dtype=np.float32)
+    picks = x[rng.choice(x.shape[0], min(n, x.shape[0]), replace=False)]
+    return _normalize(picks + noise * rng.standard_normal(picks.shape).astype(np.float32))
+
+if __name__ == "__main__":
+    # 사용법: python ann_index.py [backend(auto|faiss|numpy)] [nlist]
+    # 친밀도 구간별로 전체 카테고리 통합 인덱스(cached_embeddings/all_N.*)를 만들고 recall을 출력한다.
+    from final_test import build_cross_category_store
+
+    backend = sys.argv[1] if len(sys.argv) > 1 else "auto"
+    nlist = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    for score in (1, 2, 3, 4):
+        base_path, store = build_cross_category_store(score)
+        if store is None:
+            continue
+        embeddings = store["embeddings"].numpy()
+        start = time.perf_counter()
+        index = build_index(embeddings, backend=backend, nlist=nlist)
+        path = index.save(index_path(base_path, index.backend))
+        save_fingerprint(base_path, embeddings, store["name"])
+        print(f"[✓] {path}: {embeddings.shape[0]}개, nlist={index.nlist}, {time.perf_counter() - start:.1f}s")
+
+        queries = sample_queries(embeddings)
+        for nprobe in (1, 4, 8, 16, 32):
+            if nprobe > index.nlist:
+                break
+            print(f"    {recall_at_k(index, embeddings, queries, top_k=5, nprobe=nprobe)}")
@@ -1,27 +1,91 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify, Response, stream_with_context, send_from_directory
 import os
-import uuid
+import re
 import json
+import time
+import threading
 from flask_cors import CORS
-import uuid
 
 
-from final_test import extract_kakao_dialogues, is_valid_conversation, classify_topic, classify_avg_score_from_pairs, extract_interest_weighted_keywords, recommend_products_from_keywords
+from final_test import embedding_cache_info, prewarm_embedding_cache, phrase_cache, get_message_cache, batcher_stats, registry
+from noun_extractor import noun_cache_info
+from pipeline import invalidate_analysis, get_day_cache, analyze_upload, recommend_upload, iter_summaries, iter_recommendations
+from upload_store import UploadSink, UploadTooLarge, UploadFormatError, MAX_UPLOAD_BYTES
+import metrics
+from metrics import UPLOAD_BYTES, HTTP_REQUESTS, HTTP_SECONDS
+from jobs import submit_job, get_job, job_status, resume_jobs, JOB_KINDS
+from profiling import profiled, list_profiles, profile_dir, authorized
 
-app = Flask(__name__)
-CORS(app)
 UPLOAD_FOLDER = "uploaded"
-ANALYSIS_FOLDER = "analysis"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(ANALYSIS_FOLDER, exist_ok=True)
 
-def api_response(success, data=None, message=None, error=None):
-    return jsonify({
+class UploadRequest(Request):
+    # 업로드 파일을 메모리/임시 파일에 모으지 않고 받는 대로 해시하며 UPLOAD_FOLDER에 기록
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadSink(UPLOAD_FOLDER)
+
+app = Flask(__name__)
+app.request_class = UploadRequest
+# Content-Length가 한도를 넘으면 본문을 읽기 전에 413 (multipart 헤더 여유분 1MB)
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES + 1024 * 1024
+CORS(app)
+
+# 서버는 바로 요청을 받고, 모델/상품 임베딩 인덱스는 on_startup()이 띄운 백그라운드 스레드에서 미리 로드한다.
+# /readyz 는 모든 모델이 로드되고 warmup이 끝나야 200 (WARMUP_ON_START=0 이면 첫 요청 때 필요한 모델만 로드)
+WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "1") == "1"
+PREWARM_EMBEDDINGS = os.environ.get("PREWARM_EMBEDDINGS", "1") == "1"
+startup = {"startedAt": time.time(), "warmupDone": False, "warmupSeconds": None,
+           "modelLoadSeconds": {}, "embeddingsLoaded": None}
+
+def warmup():
+    start = time.perf_counter()
+    startup["modelLoadSeconds"] = registry.warmup()
+    if PREWARM_EMBEDDINGS:
+        startup["embeddingsLoaded"] = prewarm_embedding_cache()
+    get_message_cache()
+    startup["warmupSeconds"] = round(time.perf_counter() - start, 3)
+    startup["warmupDone"] = True
+    print(f"[✓] warmup 완료 ({startup['warmupSeconds']}s)")
+
+# warmup 과 재시작 전에 끝나지 않은 비동기 작업 재개는 import 시점이 아니라 서버 프로세스에서 on_startup()으로 한 번만 실행한다
+# (debug 재로더의 감시 프로세스나 spawn 워커가 이 모듈을 다시 import 해도 모델 로드/작업이 중복되지 않도록)
+RESUME_JOBS = os.environ.get("RESUME_JOBS", "1") == "1"
+_started = False
+
+def on_startup(resume=None, warmup_models=None):
+    """
+    서버 시작 시 한 번: python app.py 는 __main__ 에서, serve.py 는 워커마다 호출 (warmup 은 부모 preload, 재개는 0번 워커만)
+    """
+    global _started
+    if _started:
+        return
+    _started = True
+    if WARMUP_ON_START if warmup_models is None else warmup_models:
+        threading.Thread(target=warmup, name="warmup", daemon=True).start()
+    else:
+        startup["warmupDone"] = True
+    if RESUME_JOBS if resume is None else resume:
+        resume_jobs()
+
+def api_response(success, data=None, message=None, error=None, meta=None):
+    body = {
         "success": success,
         "data": data,
         "message": message,
         "error": error
-    })
+    }
+    if meta is not None:
+        body["meta"] = meta
+    return jsonify(body)
+
+@app.errorhandler(413)
+@app.errorhandler(UploadTooLarge)
+def upload_too_large(e):
+    return api_response(False, error=f"파일이 너무 큽니다. (최대 {MAX_UPLOAD_BYTES // (1024 * 1024)}MB)"), 413
+
+@app.errorhandler(UploadFormatError)
+def upload_format_error(e):
+    return api_response(False, error=str(e)), 400
 
 @app.route("/api/upload", methods=["POST"])
 def upload_file():
@@ -29,77 +93,231 @@ def upload_file():
     if not file:
         return api_response(False, error="파일이 없습니다.")
 
-    file_id = str(uuid.uuid4())
+    # 파일 id = 풀린 텍스트의 내용 해시 → 같은 대화를 다시 올리면 같은 id와 저장된 분석 결과를 그대로 쓴다
+    sink = file.stream
+    file_id, duplicate = sink.finish()
+    UPLOAD_BYTES.observe(sink.size)
+    data = {"fileId": file_id, "duplicate": duplicate, "format": sink.format, "size": sink.size}
+    return api_response(True, data=data, message="이미 업로드된 파일" if duplicate else "파일 업로드 성공")
+
+def profile_requested(data):
+    # 요청 본문 "profile": true 또는 X-Profile: 1 헤더 → 이 요청을 프로파일링 (PROFILE_SAMPLE_N 샘플링과 별개)
+    # PROFILING=1 일 때만, PROFILE_TOKEN 이 있으면 X-Profile-Token 이 맞을 때만
+    wanted = bool(data.get("profile")) or request.headers.get("X-Profile", "").lower() in ("1", "true", "yes")
+    return wanted and authorized(request.headers.get("X-Profile-Token"))
+
+# 업로드 파일 id = 풀린 텍스트 sha256 앞 32자리 (upload_store). 다른 값은 경로로 쓰지 않는다.
+FILE_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+def upload_path(file_id):
+    """
+    fileId → 업로드 파일 경로. 형식이 틀렸거나(경로 조작 등) 파일이 없으면 None
+    """
+    if not isinstance(file_id, str) or not FILE_ID_PATTERN.fullmatch(file_id):
+        return None
     path = os.path.join(UPLOAD_FOLDER, file_id + ".txt")
-    file.save(path)
-    return api_response(True, data={"fileId": file_id}, message="파일 업로드 성공")
+    return path if os.path.exists(path) else None
+
+def submit_response(kind, file_id, file_path, recompute):
+    job_id = submit_job(kind, file_id, file_path, recompute)
+    return api_response(True, data={"jobId": job_id, "statusUrl": f"/api/jobs/{job_id}"}, message="작업 등록")
 
 @app.route("/api/analyze", methods=["POST"])
 def analyze_file():
     data = request.get_json()
     file_id = data.get("fileId")
-    file_path = os.path.join(UPLOAD_FOLDER, file_id + ".txt")
-    if not os.path.exists(file_path):
+    file_path = upload_path(file_id)
+    if not file_path:
         return api_response(False, error="해당 파일을 찾을 수 없습니다.")
 
-    data_by_date = extract_kakao_dialogues(file_path)
-    result = []
+    recompute = bool(data.get("recompute"))
+    if data.get("async"):
+        return submit_response("analyze", file_id, file_path, recompute)
+    with profiled("analyze", profile_requested(data), fileId=file_id, recompute=recompute) as profile:
+        result, stats = analyze_upload(file_id, file_path, recompute)
+    return api_response(True, data=result, message="분석 완료", meta={**stats, **profile})
 
-    for date, msgs in sorted(data_by_date.items()):
-        msgs = [m for m in msgs if is_valid_conversation(m)]
-        if not msgs:
-            continue
-        full_text = " ".join(msgs)
-        subject, main_cat = classify_topic(full_text)
-        intimacy = classify_avg_score_from_pairs(msgs)
-        keywords = extract_interest_weighted_keywords(msgs)
+@app.route("/api/recommendations", methods=["POST"])
+def recommend_file():
+    data = request.get_json()
+    file_id = data.get("fileId")
+    file_path = upload_path(file_id)
+    if not file_path:
+        return api_response(False, error="해당 파일을 찾을 수 없습니다.")
 
-        result.append({
-            "date": date,
-            "subject": subject,
-            "category": main_cat,
-            "intimacy": intimacy,
-            "keywords": [{"name": kw, "score": round(score, 2)} for kw, score in keywords[:5]]
-        })
+    # 저장된 분석 결과를 재사용하고 상품 검색만 수행
+    recompute = bool(data.get("recompute"))
+    if data.get("async"):
+        return submit_response("recommendations", file_id, file_path, recompute)
+    with profiled("recommendations", profile_requested(data), fileId=file_id, recompute=recompute) as profile:
+        result, stats = recommend_upload(file_id, file_path, recompute)
+    return api_response(True, data=result, message="추천 완료", meta={**stats, **profile})
 
-    return api_response(True, data=result, message="분석 완료")
+def stream_response(items, fmt, stats=None):
+    """
+    날짜별 결과를 준비되는 대로 전송. fmt="sse" → Server-Sent Events, "ndjson" → 한 줄에 JSON 하나
+    stats(dict)는 스트림이 끝난 뒤 done 이벤트에 함께 보낸다 (재사용/재계산 날짜 수).
+    """
+    def generate():
+        count = 0
+        try:
+            for item in items:
+                count += 1
+                payload = json.dumps(item, ensure_ascii=False, default=str)
+                yield f"event: day\ndata: {payload}\n\n" if fmt == "sse" else payload + "\n"
+            done = json.dumps({"done": True, "count": count, **(stats or {})})
+        except Exception as e:
+            print(f"[!] 스트리밍 실패: {e}")
+            done = json.dumps({"done": False, "count": count, "error": str(e)}, ensure_ascii=False)
+        yield f"event: done\ndata: {done}\n\n" if fmt == "sse" else done + "\n"
 
-@app.route("/api/recommendations", methods=["POST"])
-def recommend_file():
+    mimetype = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def stream_request():
+    """
+    POST JSON 본문 또는 GET 쿼리(EventSource용)에서 fileId/recompute/format 읽기
+    """
+    data = request.get_json(silent=True) or request.args
+    file_id = data.get("fileId")
+    file_path = upload_path(file_id)
+    recompute = str(data.get("recompute", "")).lower() in ("1", "true")
+    fmt = data.get("format", "sse")
+    return file_id, file_path, recompute, fmt
+
+@app.route("/api/analyze/stream", methods=["GET", "POST"])
+def analyze_stream():
+    file_id, file_path, recompute, fmt = stream_request()
+    if not file_path:
+        return api_response(False, error="해당 파일을 찾을 수 없습니다.")
+    stats = {}
+    return stream_response(iter_summaries(file_id, file_path, recompute, stats), fmt, stats)
+
+@app.route("/api/recommendations/stream", methods=["GET", "POST"])
+def recommend_stream():
+    file_id, file_path, recompute, fmt = stream_request()
+    if not file_path:
+        return api_response(False, error="해당 파일을 찾을 수 없습니다.")
+    stats = {}
+    return stream_response(iter_recommendations(file_id, file_path, recompute, stats), fmt, stats)
+
+@app.route("/api/jobs", methods=["POST"])
+def create_job():
     data = request.get_json()
     file_id = data.get("fileId")
-    file_path = os.path.join(UPLOAD_FOLDER, file_id + ".txt")
-    if not os.path.exists(file_path):
+    kind = data.get("kind", "analyze")
+    if kind not in JOB_KINDS:
+        return api_response(False, error=f"지원하지 않는 작업 종류입니다: {kind}")
+    file_path = upload_path(file_id)
+    if not file_path:
         return api_response(False, error="해당 파일을 찾을 수 없습니다.")
+    return submit_response(kind, file_id, file_path, bool(data.get("recompute")))
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_detail(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return api_response(False, error="해당 작업을 찾을 수 없습니다.")
+    return api_response(True, data=job_status(job), message=job["status"])
+
+@app.route("/api/analysis/<file_id>", methods=["DELETE"])
+def delete_analysis(file_id):
+    if not FILE_ID_PATTERN.fullmatch(file_id):
+        return api_response(False, error="해당 파일을 찾을 수 없습니다."), 404
+    removed = invalidate_analysis(file_id)
+    return api_response(True, data={"fileId": file_id, "removed": removed}, message="분석 결과 삭제")
+
+@app.before_request
+def start_timer():
+    request.started_at = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    # 라벨은 URL 규칙(/api/jobs/<job_id>)으로 → 요청마다 새 시계열이 생기지 않게
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    if hasattr(request, "started_at"):
+        HTTP_SECONDS.observe(time.perf_counter() - request.started_at, endpoint=endpoint)
+    return response
+
+def collect_runtime_metrics():
+    families = [
+        ("presentrec_process_info", "gauge", "Serving process", [({"pid": os.getpid()}, 1)]),
+        ("presentrec_model_loaded", "gauge", "Whether each registered model is loaded",
+         [({"model": name}, int(s["loaded"])) for name, s in registry.status().items()]),
+        ("presentrec_model_load_seconds", "gauge", "Model load time",
+         [({"model": name}, s["load_seconds"]) for name, s in registry.status().items() if s["load_seconds"] is not None]),
+    ]
+    batchers = batcher_stats()
+    if batchers:
+        for key, kind in (("queue_depth", "gauge"), ("batches", "counter"), ("items", "counter"),
+                          ("avg_batch_size", "gauge"), ("avg_queue_wait_ms", "gauge"), ("avg_batch_run_ms", "gauge")):
+            name = f"presentrec_microbatch_{key}" + ("_total" if kind == "counter" else "")
+            families.append((name, kind, f"Micro-batcher {key}", [({"model": b["model"]}, b[key]) for b in batchers]))
+    caches = {"products": embedding_cache_info(), "phrases": phrase_cache.info(), "nouns": noun_cache_info()}
+    for name, cache in (("messages", get_message_cache()), ("days", get_day_cache())):
+        if cache:
+            caches[name] = cache.info()
+    families.append(("presentrec_cache_hits_total", "counter", "Cache hits",
+                     [({"cache": name}, info["hits"]) for name, info in caches.items()]))
+    families.append(("presentrec_cache_misses_total", "counter", "Cache misses",
+                     [({"cache": name}, info["misses"]) for name, info in caches.items()]))
+    families.append(("presentrec_cache_size", "gauge", "Cache entries",
+                     [({"cache": name}, info["size"]) for name, info in caches.items()]))
+    return families
+
+metrics.register_collector(collect_runtime_metrics)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
-    data_by_date = extract_kakao_dialogues(file_path)
-    result = []
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    # 프로세스가 살아 있으면 200 (모델 로드 여부와 무관)
+    return jsonify({"status": "ok", "uptimeSeconds": round(time.time() - startup["startedAt"], 3)})
 
-    for date, msgs in sorted(data_by_date.items()):
-        msgs = [m for m in msgs if is_valid_conversation(m)]
-        if not msgs:
-            continue
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    # 모든 모델이 실제로 로드되고 (warmup을 띄웠다면) 끝나야 200, 그 전에는 503 (WARMUP_ON_START 와 무관)
+    ready = startup["warmupDone"] and registry.ready()
+    body = {"ready": ready, "pid": os.getpid(), "warmupSeconds": startup["warmupSeconds"],
+            "embeddingsLoaded": startup["embeddingsLoaded"], "models": registry.status()}
+    return jsonify(body), 200 if ready else 503
 
-        full_text = " ".join(msgs)
-        subject, main_cat = classify_topic(full_text)
-        intimacy = classify_avg_score_from_pairs(msgs)
-        keywords = extract_interest_weighted_keywords(msgs)
+@app.route("/api/profiles", methods=["GET"])
+def profiles_list():
+    if not authorized(request.headers.get("X-Profile-Token")):
+        return api_response(False, error="해당 기능을 찾을 수 없습니다."), 404
+    return api_response(True, data=list_profiles(), message="저장된 프로파일 목록")
 
-        # 추천 결과 → 바로 products로 받기 (이제 dict 포함됨)
-        recs = recommend_products_from_keywords(
-            sorted_keywords=keywords,
-            allowed_category=main_cat,
-            intimacy_score=intimacy
-        )
+@app.route("/api/profiles/<profile_id>/<filename>", methods=["GET"])
+def profile_download(profile_id, filename):
+    # cprofile.prof (snakeviz / pstats), cprofile.txt, torch_trace.json (chrome://tracing, Perfetto), torch_ops.txt
+    if not authorized(request.headers.get("X-Profile-Token")):
+        return api_response(False, error="해당 기능을 찾을 수 없습니다."), 404
+    path = profile_dir(profile_id)
+    if path is None:
+        return api_response(False, error="해당 프로파일을 찾을 수 없습니다."), 404
+    return send_from_directory(os.path.abspath(path), filename, as_attachment=True)
 
-        result.append({
-            "date": date,
-            "recommendations": recs  # [{id, name, imageUrl, ...}, ...]
-        })
+@app.route("/api/models/batching", methods=["GET"])
+def model_batching_status():
+    return api_response(True, data=batcher_stats(), message="모델별 마이크로 배칭 상태")
 
-    return api_response(True, data=result, message="추천 완료")
+@app.route("/api/cache/embeddings", methods=["GET"])
+def embedding_cache_status():
+    data = {"products": embedding_cache_info(), "phrases": phrase_cache.info(), "nouns": noun_cache_info(),
+            "messages": get_message_cache().info() if get_message_cache() else None,
+            "days": get_day_cache().info() if get_day_cache() else None}
+    return api_response(True, data=data, message="임베딩 캐시 상태")
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # debug 재로더가 켜져 있으면 실제로 요청을 받는 자식 프로세스(WERKZEUG_RUN_MAIN=true)에서만 시작 작업 실행
+    debug = True
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        on_startup()
+    app.run(host="0.0.0.0", port=5000, debug=debug)
 
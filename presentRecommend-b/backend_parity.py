@@ -0,0 +1,125 @@
+import os
+import re
+import sys
+import json
+import glob
+import time
+from contextlib import contextmanager
+
+os.environ["INFERENCE_BACKEND"] = "torch"   # 기준(fp32 torch) 모델로 로드
+os.environ["MICRO_BATCHING"] = "0"
+import final_test
+from final_test import registry
+from inference_backend import apply_backend, BACKENDS
+
+# 추론 백엔드 동등성/지연 비교: fp32 torch 기준 대비 int8 / onnx / onnx-int8
+# - 관심 분류: data/*.jsonl 의 input → 라벨 일치율 (+ 정답 라벨 정확도)
+# - 주제/친밀도: k_ddrel 대화 → 주제 일치율, 쌍별 친밀도 점수 차이
+# - 문장 임베딩: 코사인 유사도
+# 사용법: python backend_parity.py [presentRecommend-ai/data 경로] [샘플 수] [백엔드 ...]
+
+def load_interest_samples(data_dir, limit):
+    samples = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    samples.append((row["input"], int(row["label"])))
+    return samples[:limit]
+
+def load_ddrel_dialogues(data_dir, limit):
+    dialogues = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "k_ddrel", "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                msgs = [re.sub(r"^[AB]:\s*", "", m).strip() for m in row.get("context", [])]
+                msgs = [m for m in msgs if m]
+                if len(msgs) >= 2:
+                    dialogues.append(msgs)
+                if len(dialogues) >= limit:
+                    return dialogues
+    return dialogues
+
+@contextmanager
+def use_models(models):
+    names = ("interest_model", "topic_model", "embedding_model")
+    saved = [registry.override(name, model) for name, model in zip(names, models)]
+    try:
+        yield
+    finally:
+        for name, model in zip(names, saved):
+            registry.override(name, model)
+
+def run_all(sentences, dialogues, queries):
+    timings = {}
+    start = time.perf_counter()
+    labels = final_test.classify_interest_batch(sentences)
+    timings["interest"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    topics = final_test.classify_topics([" ".join(msgs) for msgs in dialogues])
+    timings["topic"] = time.perf_counter() - start
+
+    pair_texts = [text for msgs in dialogues for text in final_test.intimacy_pair_texts(msgs)]
+    start = time.perf_counter()
+    intimacy = final_test.score_intimacy_texts(pair_texts)
+    timings["intimacy"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings = registry.get("embedding_model").encode(queries, convert_to_tensor=True, normalize_embeddings=True)
+    timings["embedding"] = time.perf_counter() - start
+    return {"labels": labels, "topics": topics, "intimacy": intimacy, "embeddings": embeddings.cpu(), "timings": timings}
+
+def agreement(a, b):
+    return round(sum(x == y for x, y in zip(a, b)) / max(len(a), 1), 4)
+
+def compare(reference, candidate, gold):
+    deltas = [abs(x - y) for x, y in zip(reference["intimacy"], candidate["intimacy"])]
+    cosine = (reference["embeddings"] * candidate["embeddings"]).sum(dim=1)
+    return {
+        "interest_label_agreement": agreement(reference["labels"], candidate["labels"]),
+        "interest_accuracy": agreement(candidate["labels"], gold),
+        "topic_agreement": agreement(reference["topics"], candidate["topics"]),
+        "intimacy_mean_abs_delta": round(sum(deltas) / max(len(deltas), 1), 4),
+        "intimacy_max_abs_delta": round(max(deltas, default=0.0), 4),
+        "embedding_min_cosine": round(cosine.min().item(), 4),
+        "embedding_mean_cosine": round(cosine.mean().item(), 4),
+    }
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "../presentRecommend-ai/data"
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    backends = sys.argv[3:] or [b for b in BACKENDS if b != "torch"]
+
+    interest = load_interest_samples(data_dir, limit)
+    sentences, gold = [s for s, _ in interest], [label for _, label in interest]
+    dialogues = load_ddrel_dialogues(data_dir, max(limit // 10, 1))
+    queries = sentences[:200]
+    print(f"관심 문장 {len(sentences)}개, k_ddrel 대화 {len(dialogues)}개, 임베딩 질의 {len(queries)}개")
+
+    torch_models = tuple(registry.get(name) for name in ("interest_model", "topic_model", "embedding_model"))
+    reference = run_all(sentences, dialogues, queries)
+    report = {"torch": {"timings": {k: round(v, 3) for k, v in reference["timings"].items()},
+                        "interest_accuracy": agreement(reference["labels"], gold)}}
+
+    for backend in backends:
+        try:
+            models = apply_backend(backend, *torch_models)
+        except (FileNotFoundError, ImportError) as e:
+            print(f"[!] {backend} 건너뜀: {e}")
+            continue
+        with use_models(models):
+            candidate = run_all(sentences, dialogues, queries)
+        report[backend] = compare(reference, candidate, gold)
+        report[backend]["timings"] = {k: round(v, 3) for k, v in candidate["timings"].items()}
+        report[backend]["speedup"] = {k: round(reference["timings"][k] / max(v, 1e-9), 2)
+                                      for k, v in candidate["timings"].items()}
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,106 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+# 동시 요청들의 forward 입력을 모델별 큐에 모아 한 번에 실행하는 마이크로 배처.
+# max_batch_size 개가 모이거나 첫 입력 후 max_wait_ms 가 지나면 배치를 실행하고 각 호출자의 Future를 채운다.
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+class MicroBatcher:
+    def __init__(self, name, run_batch, max_batch_size=32, max_wait_ms=5.0):
+        """
+        run_batch(items) → items와 같은 길이의 결과 리스트
+        """
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._start()
+        # fork된 워커(serve.py)에는 부모의 스레드가 없으므로 자식에서 큐/스레드를 새로 만든다
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "items": 0, "errors": 0, "max_batch_size_seen": 0,
+                       "wait_seconds": 0.0, "run_seconds": 0.0}
+        self._histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._thread = threading.Thread(target=self._loop, name=f"batcher-{self.name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def map(self, items):
+        """
+        items를 큐에 넣고 결과가 모두 나올 때까지 기다린다 (다른 요청의 입력과 같은 배치로 묶일 수 있음)
+        """
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(block=timeout > 0, timeout=max(timeout, 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _, _ in batch]
+            started = time.perf_counter()
+            try:
+                results = self.run_batch(items)
+                error = None
+            except Exception as e:
+                results, error = None, e
+            finished = time.perf_counter()
+
+            for i, (_, future, _) in enumerate(batch):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[i])
+
+            with self._stats_lock:
+                self._stats["batches"] += 1
+                self._stats["items"] += len(batch)
+                self._stats["errors"] += error is not None
+                self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], len(batch))
+                self._stats["wait_seconds"] += sum(started - queued for _, _, queued in batch)
+                self._stats["run_seconds"] += finished - started
+                for bucket in BATCH_SIZE_BUCKETS:
+                    if len(batch) <= bucket:
+                        self._histogram[bucket] += 1
+                        break
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+            histogram = dict(self._histogram)
+        batches = stats["batches"] or 1
+        items = stats["items"] or 1
+        return {
+            "model": self.name,
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": stats["batches"],
+            "items": stats["items"],
+            "errors": stats["errors"],
+            "avg_batch_size": round(stats["items"] / batches, 2),
+            "max_batch_size_seen": stats["max_batch_size_seen"],
+            "avg_queue_wait_ms": round(stats["wait_seconds"] / items * 1000, 3),
+            "avg_batch_run_ms": round(stats["run_seconds"] / batches * 1000, 3),
+            "batch_size_histogram": {f"le_{bucket}": count for bucket, count in histogram.items()},
+        }
@@ -0,0 +1,49 @@
+import sys
+import time
+from final_test import extract_kakao_dialogues, is_valid_conversation, score_intimacy_pairs, INTIMACY_BATCH_SIZE
+
+# 친밀도 쌍 스코어링 벤치마크: 쌍마다 forward (batch_size=1, 예전 방식) vs 길이순 배치
+# 배치 점수가 쌍마다 forward 한 점수와 PARITY_TOLERANCE 이상 다르면 실패(exit 1)
+# 사용법: python bench_intimacy.py [카톡 파일] [최소 쌍 개수] [배치 크기]
+
+PARITY_TOLERANCE = 1e-4
+
+def load_messages(path, min_pairs):
+    msgs = []
+    for _, day in sorted(extract_kakao_dialogues(path).items()):
+        msgs.extend(m for m in day if is_valid_conversation(m))
+    if not msgs:
+        raise SystemExit(f"[!] {path}: 유효한 메시지 없음")
+    # 작은 예제 파일은 반복해서 원하는 쌍 개수까지 늘린다
+    while len(msgs) - 1 < min_pairs:
+        msgs = msgs + msgs
+    return msgs[:min_pairs + 1]
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "chat_exam.txt"
+    min_pairs = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else INTIMACY_BATCH_SIZE
+
+    msgs = load_messages(path, min_pairs)
+    n_pairs = len(msgs) - 1
+    score_intimacy_pairs(msgs[:9], batch_size)   # 워밍업
+
+    before, t_before = timed(lambda: score_intimacy_pairs(msgs, batch_size=1))
+    after, t_after = timed(lambda: score_intimacy_pairs(msgs, batch_size=batch_size))
+
+    max_delta = max(abs(a - b) for a, b in zip(before, after))
+    avg_before = round(sum(before) / len(before), 2)
+    avg_after = round(sum(after) / len(after), 2)
+
+    print(f"쌍 개수: {n_pairs}")
+    print(f"쌍마다 forward   : {n_pairs / t_before:8.1f} pairs/s ({t_before:.2f}s)")
+    print(f"배치 {batch_size:>3} (길이순) : {n_pairs / t_after:8.1f} pairs/s ({t_after:.2f}s) → x{t_before / t_after:.1f}")
+    print(f"쌍별 최대 |Δ| = {max_delta:.2e}, 평균 점수 {avg_before} vs {avg_after} ({'일치' if avg_before == avg_after else '불일치'})")
+    if max_delta > PARITY_TOLERANCE:
+        print(f"[!] 배치 점수가 쌍마다 forward 한 점수와 다름 (허용 {PARITY_TOLERANCE:.0e})")
+        sys.exit(1)
@@ -0,0 +1,52 @@
+import sys
+import time
+from final_test import extract_kakao_dialogues, is_valid_conversation
+import noun_extractor
+from noun_extractor import extract_nouns, clear_noun_cache, get_okt, shutdown_pool
+
+# Okt 명사 추출 벤치마크: chat_exam.txt 메시지를 반복해 원하는 줄 수까지 늘린 뒤
+# (1) 매번 okt.nouns (2) 내용 기준 캐시 (3) 캐시 + 프로세스 풀 처리량을 비교한다.
+# 사용법: python bench_okt.py [카톡 파일] [줄 수] [워커 수]
+
+def scaled_messages(path, n_lines):
+    msgs = [m for _, day in sorted(extract_kakao_dialogues(path).items()) for m in day if is_valid_conversation(m)]
+    if not msgs:
+        raise SystemExit(f"[!] {path}: 유효한 메시지 없음")
+    return (msgs * (n_lines // len(msgs) + 1))[:n_lines]
+
+def report(label, n_lines, seconds):
+    print(f"{label:<24}: {n_lines / seconds:10.1f} lines/s ({seconds:.2f}s)")
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "chat_exam.txt"
+    n_lines = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    msgs = scaled_messages(path, n_lines)
+    print(f"메시지 {len(msgs)}줄 (고유 {len(set(msgs))}개)")
+    okt = get_okt()
+    okt.nouns(msgs[0])   # JVM 워밍업
+
+    start = time.perf_counter()
+    baseline = [tuple(okt.nouns(m)) for m in msgs]
+    report("okt.nouns (캐시 없음)", n_lines, time.perf_counter() - start)
+
+    clear_noun_cache()
+    start = time.perf_counter()
+    cached = extract_nouns(msgs, workers=0)
+    report("캐시", n_lines, time.perf_counter() - start)
+
+    # 풀 효과만 보기 위해 모든 줄을 고유하게 만든다 (뒤에 줄 번호 추가)
+    unique = [f"{m} {i}" for i, m in enumerate(msgs)]
+    noun_extractor.NOUN_POOL_MIN_SENTENCES = 0
+    for label, w in (("고유 문장, 단일 프로세스", 0), (f"고유 문장, 풀 {workers}개", workers)):
+        clear_noun_cache()
+        if w:
+            extract_nouns(unique[:w * noun_extractor.NOUN_POOL_CHUNK], workers=w)   # 워커 JVM 기동
+            clear_noun_cache()
+        start = time.perf_counter()
+        extract_nouns(unique, workers=w)
+        report(label, n_lines, time.perf_counter() - start)
+    shutdown_pool()
+
+    print(f"캐시 결과 일치: {cached == baseline}")
@@ -0,0 +1,64 @@
+import os
+import re
+import sys
+import time
+import tempfile
+import tracemalloc
+from collections import defaultdict
+from kakao_parser import iter_kakao_messages, extract_kakao_dialogues
+
+# 카카오톡 파서 처리량(lines/s) 벤치마크: 예전 readlines + 매 줄 re.search 방식 vs 스트리밍 파서
+# 사용법: python bench_parser.py [카톡 파일] [줄 수]
+
+def extract_kakao_dialogues_readlines(path):
+    # 비교용: 스트리밍 파서 도입 전 구현
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    data_by_date = defaultdict(list)
+    for line in lines:
+        if m := re.search(r"(\d{4})년 (\d{1,2})월 (\d{1,2})일", line):
+            y, m_, d = m.groups()
+            current_date = f"{int(y):04d}-{int(m_):02d}-{int(d):02d}"
+        elif re.search(r"[오전|오후]+\s*\d{1,2}:\d{2},\s*[^:]+:", line):
+            msg = re.sub(r"^\d{4}\. \d{1,2}\. \d{1,2}\. [오전|오후]+\s*\d{1,2}:\d{2},\s*[^:]+:\s*", "", line).strip()
+            if msg:
+                data_by_date[current_date].append(msg)
+    return data_by_date
+
+def scaled_copy(path, n_lines):
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    body = [line if line.endswith("\n") else line + "\n" for line in lines]
+    out = tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".txt", delete=False)
+    written = 0
+    while written < n_lines:
+        out.writelines(body)
+        written += len(body)
+    out.close()
+    return out.name, written
+
+def measure(label, fn, n_lines):
+    # 처리량은 tracemalloc 없이 재고, 최대 메모리는 따로 한 번 더 실행해서 잰다
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<28}: {n_lines / seconds:12.0f} lines/s ({seconds:.2f}s, 최대 메모리 {peak / 2**20:.1f} MiB)")
+    return result
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "chat_exam.txt"
+    n_lines = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+
+    scaled, written = scaled_copy(path, n_lines)
+    try:
+        print(f"{written}줄, {os.path.getsize(scaled) / 2**20:.1f} MiB")
+        old = measure("readlines + re.search", lambda: extract_kakao_dialogues_readlines(scaled), written)
+        measure("iter_kakao_messages (소비만)", lambda: sum(1 for _ in iter_kakao_messages(scaled)), written)
+        new = measure("extract_kakao_dialogues", lambda: extract_kakao_dialogues(scaled), written)
+        print(f"결과 일치: {old == new}")
+    finally:
+        os.remove(scaled)
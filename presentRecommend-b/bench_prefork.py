@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import uuid
+import subprocess
+import urllib.request
+import urllib.error
+
+# 멀티 워커 메모리 측정: serve.py 를 워커 1/4/8개로 띄워 워커별 RSS/PSS/USS(고유 메모리)를 잰다.
+# preload(공유 가중치)와 --no-preload(워커마다 따로 로드)를 비교한다. PSS 합계가 실제 점유 메모리에 가깝다.
+# 사용법: python bench_prefork.py [카톡 파일] [워커 수 ...]
+
+PORT = 5055
+
+def smaps(pid):
+    """
+    /proc/<pid>/smaps_rollup → MiB 단위 {rss, pss, uss, shared}
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    uss = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return {"rss": round(values.get("Rss", 0), 1), "pss": round(values.get("Pss", 0), 1), "uss": round(uss, 1),
+            "shared": round(values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0), 1)}
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+def get_json(path, timeout=5):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{PORT}{path}", timeout=timeout) as resp:
+            return resp.status, json.load(resp)
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except OSError:
+        return None, None
+
+def post_json(path, body, timeout=600):
+    req = urllib.request.Request(f"http://127.0.0.1:{PORT}{path}", json.dumps(body).encode(),
+                                 {"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.load(resp)
+
+def upload(path):
+    boundary = uuid.uuid4().hex
+    with open(path, "rb") as f:
+        payload = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"chat.txt\"\r\n\r\n").encode() \
+                  + f.read() + f"\r\n--{boundary}--\r\n".encode()
+    req = urllib.request.Request(f"http://127.0.0.1:{PORT}/api/upload", payload,
+                                 {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        return json.load(resp)["data"]["fileId"]
+
+def wait_ready(workers, timeout=900):
+    """
+    /readyz 가 워커 수만큼 서로 다른 pid에서 200을 돌려줄 때까지 대기
+    """
+    seen = set()
+    deadline = time.time() + timeout
+    while len(seen) < workers:
+        if time.time() > deadline:
+            raise SystemExit(f"[!] {timeout}s 안에 준비된 워커 {len(seen)}/{workers}개")
+        status, body = get_json("/readyz")
+        if status == 200:
+            seen.add(body["pid"])
+        else:
+            time.sleep(0.2)
+
+def measure(workers, preload, chat_path):
+    args = [sys.executable, "serve.py", "--workers", str(workers), "--port", str(PORT), "--host", "127.0.0.1"]
+    if not preload:
+        args.append("--no-preload")
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        start = time.perf_counter()
+        wait_ready(workers)
+        ready_seconds = time.perf_counter() - start
+        # 추론 경로를 한 번씩 거치게 해 활성값/캐시까지 포함된 상주 메모리를 잰다
+        file_id = upload(chat_path)
+        for _ in range(workers * 2):
+            post_json("/api/analyze", {"fileId": file_id, "recompute": True})
+        pids = children(proc.pid)
+        per_worker = [smaps(pid) for pid in pids]
+        parent = smaps(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        "workers": workers,
+        "preload": preload,
+        "ready_seconds": round(ready_seconds, 1),
+        "parent": parent,
+        "per_worker": per_worker,
+        "avg_worker_rss": round(sum(w["rss"] for w in per_worker) / len(per_worker), 1),
+        "avg_worker_uss": round(sum(w["uss"] for w in per_worker) / len(per_worker), 1),
+        "total_pss": round(parent["pss"] + sum(w["pss"] for w in per_worker), 1),
+    }
+
+if __name__ == "__main__":
+    chat_path = sys.argv[1] if len(sys.argv) > 1 else "chat_exam.txt"
+    worker_counts = [int(n) for n in sys.argv[2:]] or [1, 4, 8]
+    results = []
+    for workers in worker_counts:
+        for preload in (True, False):
+            r = measure(workers, preload, chat_path)
+            results.append(r)
+            print(f"워커 {workers}개 preload={'on ' if preload else 'off'}: 워커당 RSS {r['avg_worker_rss']:.0f} MiB, "
+                  f"고유(USS) {r['avg_worker_uss']:.0f} MiB, 전체 PSS {r['total_pss']:.0f} MiB, 준비 {r['ready_seconds']}s")
+    os.makedirs("results", exist_ok=True)
+    with open("results/prefork_memory.json", "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print("[✓] results/prefork_memory.json")
@@ -0,0 +1,66 @@
+import os
+import sys
+import json
+import subprocess
+
+# 서버 기동 시간 벤치마크: 새 프로세스에서 app을 import하고
+# (1) import 완료(= /healthz 응답 가능) (2) /readyz 200 (모든 모델 + 임베딩 warmup 완료) 까지 걸린 시간과 모델별 로드 시간을 잰다.
+# 비교용으로 예전처럼 import 중에 모든 모델을 동기 로드하는 경우(eager)도 측정한다.
+# /readyz 가 제한 시간(초) 안에 200이 되지 않으면 모델별 로드 오류를 출력하고 실패(exit 1)한다.
+# 사용법: python bench_startup.py [반복 횟수] [제한 시간(초)]
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+eager = sys.argv[1] == "eager"
+if eager:
+    from final_test import registry, prewarm_embedding_cache
+    registry.warmup()
+    prewarm_embedding_cache()
+import app
+app.on_startup(resume=False)
+imported = time.perf_counter() - start
+client = app.app.test_client()
+health = client.get("/healthz").status_code
+deadline = time.perf_counter() + float(sys.argv[2])
+while client.get("/readyz").status_code != 200:
+    status = app.registry.status()
+    # warmup이 끝났는데 로드 오류가 있으면 더 기다려도 준비되지 않는다
+    failed = app.startup["warmupDone"] and any(v["error"] for v in status.values())
+    if failed or time.perf_counter() > deadline:
+        errors = {k: v["error"] for k, v in status.items() if v["error"] or not v["loaded"]}
+        print(json.dumps({"timeout": True, "errors": errors}, ensure_ascii=False))
+        sys.exit(1)
+    time.sleep(0.05)
+ready = time.perf_counter() - start
+print(json.dumps({"import_seconds": round(imported, 3), "healthz_status": health, "ready_seconds": round(ready, 3),
+                  "model_load_seconds": {k: v["load_seconds"] for k, v in app.registry.status().items()}}))
+"""
+
+def run(mode, timeout):
+    env = dict(os.environ, PREWARM_EMBEDDINGS="1", WARMUP_ON_START="1")
+    out = subprocess.run([sys.executable, "-c", PROBE, mode, str(timeout)], env=env, capture_output=True, text=True)
+    lines = out.stdout.strip().splitlines()
+    try:
+        result = json.loads(lines[-1]) if lines else {}
+    except ValueError:
+        result = {}
+    if out.returncode != 0 or result.get("timeout"):
+        # /readyz 가 제한 시간 안에 200이 되지 않음 (모델 로드 실패 등) → 모델별 오류를 보여 주고 실패
+        print(f"[!] {mode}: /readyz 준비 실패 (제한 {timeout:.0f}s, exit {out.returncode})")
+        for name, error in result.get("errors", {}).items():
+            print(f"  - {name:<16}: {error or '로드되지 않음'}")
+        if not result:
+            print(out.stderr.strip()[-2000:])
+        sys.exit(1)
+    return result
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    timeout = float(sys.argv[2]) if len(sys.argv) > 2 else 600
+    for mode in ("eager", "lazy"):
+        runs = [run(mode, timeout) for _ in range(repeats)]
+        best = min(runs, key=lambda r: r["ready_seconds"])
+        print(f"{mode:<6}: /healthz 가능 {best['import_seconds']:.2f}s, /readyz 200 {best['ready_seconds']:.2f}s")
+        for name, seconds in best["model_load_seconds"].items():
+            print(f"  - {name:<16}: {seconds}s")
@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import time
+import zlib
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+from types import SimpleNamespace
+
+# 단계별 성능 벤치마크: 가짜 카카오톡 내보내기(synthetic_chat.py)로 파이프라인 단계를 따로 잰다.
+#   parse → interest → intimacy → topic → keywords → recommend (+ 전체 analyze)
+# 결과는 JSON으로 저장하고, --baseline 결과보다 --threshold 이상 느려진 단계가 있으면 실패(exit 1)한다.
+# --stub: 체크포인트/JVM 없이 결정적인 가짜 모델로 실행 (모델 밖의 파싱/배치/후처리 비용 측정용)
+# 배치 추론이 한 개씩 추론한 결과와 같은지(패리티)도 함께 검사하고, 어긋나면 실패(exit 1)한다.
+# 사용법: python bench_suite.py [--stub] [--days 30] [--messages-per-day 100] [--speakers 2]
+#                               [--repeat 3] [--output results/bench.json] [--baseline 이전.json] [--threshold 0.2]
+os.environ.setdefault("MESSAGE_CACHE", "0")   # 매 반복을 같은 조건(캐시 없음)으로
+os.environ.setdefault("DAY_CACHE", "0")
+os.environ.setdefault("MICRO_BATCHING", "0")
+
+import numpy as np
+import torch
+import final_test
+import noun_extractor
+from final_test import registry
+from synthetic_chat import write_export
+from embedding_store import save_mmap_store
+from pipeline import load_dated_messages, analyze_dated
+from keyword_batch import PhraseEmbeddingCache, extract_keywords_batch
+
+try:
+    from keybert import KeyBERT
+    from keybert.backend import BaseEmbedder
+except ImportError:
+    KeyBERT, BaseEmbedder = None, object
+
+STAGES = ["parse", "interest", "intimacy", "topic", "keywords", "recommend", "analyze"]
+PARITY_TOLERANCE = 1e-4
+
+# ── --stub 용 가짜 모델 (입력에만 의존하는 결정적 출력, 실제 모델과 같은 호출 방식) ──
+def _token_ids(text):
+    # 어절을 2글자씩 잘라 대략 subword 토큰 수를 흉내 낸다
+    return [3 + zlib.crc32(word[i:i + 2].encode()) % 8000 for word in text.split() for i in range(0, len(word), 2)]
+
+def _hashed_vectors(texts, dim=128):
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.split():
+            h = zlib.crc32(word.encode())
+            out[row, h % dim] += 1.0 if h & 1 else -1.0
+    return out
+
+class StubTokenizer:
+    # 실제 KoBERT 토크나이저처럼 기본은 왼쪽 패딩 (sorted_batches 가 오른쪽 패딩으로 고정하는지 패리티 검사로 확인)
+    padding_side = "left"
+
+    def __call__(self, texts, truncation=False, max_length=None, add_special_tokens=True, **kwargs):
+        input_ids = []
+        for text in texts:
+            ids = _token_ids(text)
+            if add_special_tokens:
+                ids = [0] + ids + [1]
+            if truncation and max_length:
+                ids = ids[:max_length]
+            input_ids.append(ids)
+        return {"input_ids": input_ids}
+
+    def pad(self, features, return_tensors="pt"):
+        rows = features["input_ids"]
+        width = max(len(r) for r in rows)
+        ids = torch.full((len(rows), width), 2, dtype=torch.long)
+        mask = torch.zeros((len(rows), width), dtype=torch.long)
+        for i, r in enumerate(rows):
+            cols = slice(0, len(r)) if self.padding_side == "right" else slice(width - len(r), width)
+            ids[i, cols] = torch.tensor(r, dtype=torch.long)
+            mask[i, cols] = 1
+        return {"input_ids": ids, "attention_mask": mask}
+
+def _pooled(input_ids, attention_mask):
+    # BERT 풀러처럼 0번 위치 토큰과 절대 위치에 의존 → 패딩 방향이 바뀌면 값이 달라진다
+    positions = torch.arange(1, input_ids.shape[1] + 1)
+    mixed = (input_ids * attention_mask * positions).sum(dim=1, keepdim=True) + input_ids[:, :1] * 31
+    return (mixed % 100003).float()
+
+def stub_interest_model(input_ids=None, attention_mask=None, **kwargs):
+    pooled = _pooled(input_ids, attention_mask)
+    return SimpleNamespace(logits=torch.cat([pooled % 7, pooled % 5], dim=1))
+
+def stub_topic_model(input_ids, attention_mask):
+    pooled = _pooled(input_ids, attention_mask)
+    subject = torch.remainder(pooled * torch.arange(1, 21, dtype=torch.float32), 97)
+    return torch.tanh(pooled / 1e5), torch.cat([pooled % 3, pooled % 2], dim=1), subject
+
+class StubSentenceEncoder:
+    def encode(self, sentences, convert_to_tensor=False, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        vectors = torch.from_numpy(_hashed_vectors([sentences] if single else list(sentences)))
+        if normalize_embeddings:
+            vectors = torch.nn.functional.normalize(vectors, dim=1)
+        vectors = vectors if convert_to_tensor else vectors.numpy()
+        return vectors[0] if single else vectors
+
+class StubKeyBERTBackend(BaseEmbedder):
+    def embed(self, documents, verbose=False):
+        return _hashed_vectors(list(documents))
+
+class StubOkt:
+    SUFFIXES = ("이", "가", "을", "를", "은", "는", "에", "도", "랑")
+
+    def nouns(self, sentence):
+        words = [w.rstrip("?!.,") for w in sentence.split()]
+        words = [w[:-1] if len(w) > 2 and w.endswith(self.SUFFIXES) else w for w in words]
+        return [w for w in words if len(w) > 1 and all("가" <= c <= "힣" for c in w)]
+
+def stub_kw_model():
+    # keybert 가 있으면 가짜 백엔드를 끼운 진짜 KeyBERT → keywords 패리티를 KeyBERT 자체와 비교할 수 있다
+    backend = StubKeyBERTBackend()
+    return KeyBERT(model=backend) if KeyBERT is not None else SimpleNamespace(model=backend)
+
+def install_stubs(workdir, products_per_category=2000):
+    """
+    모델을 가짜로 바꾸고, workdir에 카테고리별 가짜 상품 인덱스(memmap)를 만든 뒤 그 폴더로 이동한다.
+    """
+    tokenizer = StubTokenizer()
+    for name, model in (("tokenizer", tokenizer), ("topic_tokenizer", tokenizer),
+                        ("interest_model", stub_interest_model), ("topic_model", stub_topic_model),
+                        ("embedding_model", StubSentenceEncoder()),
+                        ("kw_model", stub_kw_model()), ("okt", StubOkt())):
+        registry.override(name, model)
+    noun_extractor._okt = registry.get("okt")
+
+    from synthetic_chat import PRODUCTS
+    os.makedirs(os.path.join(workdir, "cached_embeddings"), exist_ok=True)
+    encoder = registry.get("embedding_model")
+    for category, csv_path in final_test.category_to_file.items():
+        base = os.path.splitext(os.path.basename(csv_path))[0]
+        names = [f"{category} {PRODUCTS[i % len(PRODUCTS)]} {i}" for i in range(products_per_category)]
+        store = {"embeddings": encoder.encode(names, convert_to_tensor=True, normalize_embeddings=True),
+                 "name": names, "price": [10000 + i for i in range(len(names))], "brand": ["stub"] * len(names),
+                 "image_url": [f"https://example.com/{base}/{i}.jpg" for i in range(len(names))],
+                 "product_url": [f"https://gift.kakao.com/product/{i}" for i in range(len(names))]}
+        save_mmap_store(store, os.path.join(workdir, "cached_embeddings", base))
+    os.chdir(workdir)
+
+def clear_caches():
+    noun_extractor.clear_noun_cache()
+    final_test.phrase_cache.clear()
+
+def measure(fn, repeat, items):
+    """
+    fn을 repeat번 실행 (매번 명사/구문 캐시 비움) → 중앙값/최솟값과 처리량
+    """
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    median = statistics.median(seconds)
+    return result, {"seconds": round(median, 4), "min_seconds": round(min(seconds), 4), "items": items,
+                    "ms_per_item": round(median / max(items, 1) * 1000, 4),
+                    "items_per_second": round(items / median, 1) if median > 0 else None}
+
+def count_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+def run_suite(path, repeat):
+    stages = {}
+    dated_msgs, stages["parse"] = measure(lambda: load_dated_messages(path), repeat, count_lines(path))
+    days = [msgs for _, msgs in dated_msgs]
+    sentences = [m for msgs in days for m in msgs]
+    n_pairs = sum(max(len(msgs) - 1, 0) for msgs in days)
+
+    # 모델 로드/첫 호출 비용은 제외 (워밍업)
+    final_test.classify_interest_batch(sentences[:8])
+    final_test.classify_avg_score_from_pairs(days[0][:3])
+    final_test.classify_day_topics(days[:1])
+    final_test.extract_interest_weighted_keywords(days[0][:8])
+
+    _, stages["interest"] = measure(lambda: final_test.classify_interest_batch(sentences), repeat, len(sentences))
+    intimacy, stages["intimacy"] = measure(lambda: [final_test.classify_avg_score_from_pairs(msgs) for msgs in days],
+                                           repeat, n_pairs)
+    topics, stages["topic"] = measure(lambda: final_test.classify_day_topics(days), repeat, len(days))
+    keywords, stages["keywords"] = measure(lambda: [final_test.extract_interest_weighted_keywords(msgs) for msgs in days],
+                                           repeat, len(sentences))
+    final_test.recommend_products_from_keywords(keywords[0], topics[0][1], intimacy[0])
+    _, stages["recommend"] = measure(
+        lambda: [final_test.recommend_products_from_keywords(kw, cat, score)
+                 for kw, (_, cat), score in zip(keywords, topics, intimacy)], repeat, len(days))
+    _, stages["analyze"] = measure(lambda: analyze_dated(dated_msgs, reuse=False), repeat, len(days))
+    return stages, {"days": len(days), "messages": len(sentences), "pairs": n_pairs}
+
+def check_parity(dated_msgs, max_dates=10):
+    """
+    배치 추론 결과가 한 개씩 추론한 결과와 같은지 → {검사 이름: 최대 |Δ| 또는 불일치 개수}
+    """
+    days = [msgs for _, msgs in dated_msgs]
+    pairs = [text for msgs in days for text in final_test.intimacy_pair_texts(msgs)][:512]
+    single = final_test.score_intimacy_texts(pairs, batch_size=1)
+    batched = final_test.score_intimacy_texts(pairs, batch_size=final_test.INTIMACY_BATCH_SIZE)
+    parity = {"intimacy": max((abs(a - b) for a, b in zip(single, batched)), default=0.0)}
+
+    # BATCHED_PIPELINE=0 (날짜마다) vs 1 (날짜를 넘어 길이순 배치) → 날짜별 주제가 같아야 한다
+    per_date, _ = analyze_dated(dated_msgs[:max_dates], batched=False, reuse=False)
+    cross_date, _ = analyze_dated(dated_msgs[:max_dates], batched=True, reuse=False)
+    parity["pipeline_topics"] = sum((a["subject"], a["category"]) != (b["subject"], b["category"])
+                                    for a, b in zip(per_date, cross_date))
+
+    # 창 모드: 길이가 제각각인 창을 한 배치로 돌린 logits == 창 하나씩 돌린 logits
+    windows = [w for msgs in days[:max_dates] for w in final_test.topic_windows(msgs)]
+    single = final_test._topic_logits_direct(windows, final_test.TOPIC_WINDOW_TOKENS, batch_size=1)
+    batched = final_test._topic_logits_direct(windows, final_test.TOPIC_WINDOW_TOKENS)
+    parity["topic_windows"] = max((float((a - b).abs().max()) for a, b in zip(single, batched)), default=0.0)
+
+    # KeyBERT 문장 하나씩 vs extract_keywords_batch → 구문이 다르거나 점수가 어긋난 문장 수
+    kw_model = registry.get("kw_model")
+    if hasattr(kw_model, "extract_keywords"):
+        sentences = list(dict.fromkeys(m for msgs in days[:max_dates] for m in msgs))[:200]
+        batched = extract_keywords_batch(kw_model, sentences, (1, 2), top_n=5, cache=PhraseEmbeddingCache())
+        mismatched = 0
+        for sentence, got in zip(sentences, batched):
+            expected = dict(kw_model.extract_keywords(sentence, keyphrase_ngram_range=(1, 2), stop_words=None, top_n=5))
+            got = dict(got)
+            mismatched += got.keys() != expected.keys() or any(abs(got[k] - expected[k]) > PARITY_TOLERANCE for k in got)
+        parity["keywords"] = mismatched
+    return parity
+
+def compare(current, baseline, threshold):
+    """
+    baseline 대비 (threshold 비율 이상) 느려진 단계 목록 [(단계, 이전 초, 현재 초, 비율), ...]
+    """
+    regressions = []
+    for stage, now in current["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before or not before["seconds"]:
+            continue
+        ratio = now["seconds"] / before["seconds"]
+        if ratio > 1 + threshold:
+            regressions.append((stage, before["seconds"], now["seconds"], round(ratio, 3)))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", help="합성 파일 대신 사용할 카카오톡 내보내기 파일")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--messages-per-day", type=int, default=100)
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stub", action="store_true", help="가짜 모델로 실행 (체크포인트 불필요)")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="허용 지연 증가 비율 (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    cwd = os.getcwd()
+    try:
+        path = os.path.abspath(args.input) if args.input else os.path.join(workdir, "synthetic_chat.txt")
+        if not args.input:
+            write_export(path, args.days, args.messages_per_day, args.speakers, args.seed)
+        if args.stub:
+            install_stubs(workdir)
+        stages, size = run_suite(path, args.repeat)
+        parity = check_parity(load_dated_messages(path))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    mode = "stub" if args.stub else final_test.INFERENCE_BACKEND
+    result = {
+        "meta": {"mode": mode, "input": args.input or "synthetic", "days": args.days, "messages_per_day": args.messages_per_day,
+                 "speakers": args.speakers, "seed": args.seed, "repeat": args.repeat, "topic_mode": final_test.TOPIC_MODE,
+                 "python": platform.python_version(), "torch": torch.__version__, "torch_threads": torch.get_num_threads(),
+                 "machine": platform.machine(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **size},
+        "stages": stages,
+        "parity": parity,
+    }
+    for stage in STAGES:
+        s = stages[stage]
+        print(f"{stage:<10}: {s['seconds']:8.3f}s  {s['items']:>7}개  {s['ms_per_item']:8.3f} ms/개  {s['items_per_second']}/s")
+
+    output = args.output or os.path.join("results", f"bench_{mode}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"[✓] {output}")
+
+    broken = {name: delta for name, delta in parity.items() if delta > PARITY_TOLERANCE}
+    for name, delta in broken.items():
+        print(f"[!] 배치 결과 불일치 {name}: {delta:.2e}")
+    if broken:
+        sys.exit(1)
+    print(f"[✓] 배치 추론 패리티 통과 ({', '.join(parity)})")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("mode") != mode:
+            print(f"[!] 기준 결과 모드({baseline.get('meta', {}).get('mode')})가 현재({mode})와 다름")
+        regressions = compare(result, baseline, args.threshold)
+        for stage, before, now, ratio in regressions:
+            print(f"[!] 성능 저하 {stage}: {before:.3f}s → {now:.3f}s (x{ratio})")
+        if regressions:
+            sys.exit(1)
+        print(f"[✓] 기준 대비 {args.threshold:.0%} 이상 느려진 단계 없음")
@@ -0,0 +1,60 @@
+import sys
+import time
+import final_test
+from final_test import registry, classify_day_topics, classify_topics_windowed, topic_windows
+from pipeline import load_dated_messages
+
+# 하루치 주제 분류 비교: 이어 붙여 512토큰에서 자르기(truncate) vs 겹치는 창 평균(window, 창 상한별)
+# - 잘린 날짜 비율, 날짜당 창 수, 소요 시간, truncate 결과와의 일치율
+# 작은 예제 파일은 연속된 날짜를 merge개씩 합쳐 긴 날짜를 만든다.
+# 창을 한 배치로 돌린 logits 가 창 하나씩 돌린 logits 와 PARITY_TOLERANCE 이상 다르면 실패(exit 1)
+# 사용법: python bench_topic.py [카톡 파일] [합칠 날짜 수] [창 상한 ...]
+
+PARITY_TOLERANCE = 1e-4
+
+def merged_days(path, merge):
+    days = [msgs for _, msgs in load_dated_messages(path)]
+    if not days:
+        raise SystemExit(f"[!] {path}: 유효한 메시지 없음")
+    return [sum(days[i:i + merge], []) for i in range(0, len(days), merge)]
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def agreement(a, b):
+    return sum(x[0] == y[0] for x, y in zip(a, b)) / max(len(a), 1)
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "chat_exam.txt"
+    merge = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    caps = [int(n) for n in sys.argv[3:]] or [1, 2, 4, 8, 16]
+
+    days = merged_days(path, merge)
+    tok = registry.get("topic_tokenizer")
+    token_counts = [len(ids) for ids in tok([" ".join(msgs) for msgs in days], add_special_tokens=True)["input_ids"]]
+    truncated = sum(n > 512 for n in token_counts)
+    print(f"날짜 {len(days)}개, 날짜당 평균 {sum(token_counts) / len(days):.0f}토큰 (최대 {max(token_counts)}), "
+          f"512토큰 초과(잘림) {truncated}개 ({truncated / len(days):.0%})")
+    registry.get("topic_model")
+    classify_day_topics(days[:1], mode="truncate")   # 워밍업
+
+    baseline, seconds = timed(lambda: classify_day_topics(days, mode="truncate"))
+    print(f"{'truncate':<12}: {seconds:7.2f}s ({seconds / len(days) * 1000:.1f} ms/날짜)")
+
+    for cap in caps:
+        n_windows = sum(len(topic_windows(msgs, max_windows=cap)) for msgs in days)
+        result, seconds = timed(lambda: classify_topics_windowed(days, max_windows=cap))
+        print(f"{f'window ≤{cap}':<12}: {seconds:7.2f}s ({seconds / len(days) * 1000:.1f} ms/날짜), "
+              f"창 {n_windows / len(days):.1f}개/날짜 ({final_test.TOPIC_WINDOW_TOKENS}토큰), "
+              f"truncate와 일치 {agreement(baseline, result):.1%}")
+
+    windows = [w for msgs in days for w in topic_windows(msgs)]
+    single = final_test._topic_logits_direct(windows, final_test.TOPIC_WINDOW_TOKENS, batch_size=1)
+    batched = final_test._topic_logits_direct(windows, final_test.TOPIC_WINDOW_TOKENS)
+    max_delta = max((float((a - b).abs().max()) for a, b in zip(single, batched)), default=0.0)
+    print(f"창 {len(windows)}개: 배치 vs 창마다 forward logits 최대 |Δ| = {max_delta:.2e}")
+    if max_delta > PARITY_TOLERANCE:
+        print(f"[!] 배치 창 logits 가 창마다 forward 한 결과와 다름 (허용 {PARITY_TOLERANCE:.0e})")
+        sys.exit(1)
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# 날짜 블록 단위 분석 캐시: (날짜, 그날 메시지) 내용 해시 → 분석 결과(주제/친밀도/키워드)와 추천 결과.
+# 분석은 날짜와 메시지만의 함수이므로, 같은 방을 다시 내보낸 파일에서 내용이 같은 날짜는 그대로 재사용한다.
+# 추천은 상품 인덱스 버전(catalog)이 같을 때만 재사용한다.
+
+DAY_CACHE_PATH = os.environ.get("DAY_CACHE_PATH", "day_cache.sqlite3")
+DAY_CACHE_MAX = int(os.environ.get("DAY_CACHE_MAX", "200000"))
+
+def day_hash(date, msgs):
+    digest = hashlib.sha256(date.encode("utf-8"))
+    for msg in msgs:
+        digest.update(b"\x1f")
+        digest.update(msg.encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+def _json_scalar(value):
+    # CSV/인덱스에서 온 numpy 스칼라(가격 등)는 파이썬 값으로
+    return value.item() if hasattr(value, "item") else str(value)
+
+class DayCache:
+    def __init__(self, path, version, max_entries=DAY_CACHE_MAX):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS days ("
+                           "hash TEXT PRIMARY KEY, day TEXT, catalog TEXT, recommendations TEXT, last_used REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS days_last_used ON days (last_used)")
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != version:
+            if row is not None:
+                print(f"[!] 날짜 캐시 버전 변경 ({row[0]} → {version}) → 초기화")
+            self._conn.execute("DELETE FROM days")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        self._conn.commit()
+
+    def _select(self, hashes, columns):
+        rows = []
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows.extend(self._conn.execute(
+                f"SELECT hash, {columns} FROM days WHERE hash IN ({','.join('?' * len(chunk))})", chunk).fetchall())
+        return rows
+
+    def get_many(self, hashes):
+        """
+        날짜 해시 리스트 → {hash: day dict} (캐시에 있는 것만)
+        """
+        now = time.time()
+        with self._lock:
+            found = {h: json.loads(day) for h, day in self._select(hashes, "day")}
+            if found:
+                self._conn.executemany("UPDATE days SET last_used = ? WHERE hash = ?", [(now, h) for h in found])
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, days):
+        """
+        days: {hash: day dict}. 최대 개수를 넘으면 오래 안 쓴 것부터 삭제.
+        """
+        if not days:
+            return
+        now = time.time()
+        rows = [(h, json.dumps(day, ensure_ascii=False), now) for h, day in days.items()]
+        with self._lock:
+            # 분석 결과가 바뀌었을 수 있으므로 저장해 둔 추천도 비운다
+            self._conn.executemany("INSERT OR REPLACE INTO days (hash, day, catalog, recommendations, last_used) "
+                                   "VALUES (?, ?, NULL, NULL, ?)", rows)
+            count = self._conn.execute("SELECT COUNT(*) FROM days").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute("DELETE FROM days WHERE hash IN "
+                                   "(SELECT hash FROM days ORDER BY last_used LIMIT ?)", (count - self.max_entries,))
+            self._conn.commit()
+
+    def get_recommendations(self, hashes, catalog):
+        """
+        상품 인덱스 버전이 catalog 인 추천만 {hash: recommendations} 로 반환
+        """
+        with self._lock:
+            return {h: json.loads(recs) for h, cat, recs in self._select(hashes, "catalog, recommendations")
+                    if cat == catalog and recs is not None}
+
+    def put_recommendations(self, recommendations, catalog):
+        if not recommendations:
+            return
+        rows = [(catalog, json.dumps(recs, ensure_ascii=False, default=_json_scalar), h)
+                for h, recs in recommendations.items()]
+        with self._lock:
+            self._conn.executemany("UPDATE days SET catalog = ?, recommendations = ? WHERE hash = ?", rows)
+            self._conn.commit()
+
+    def info(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM days").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size, "max_size": self.max_entries,
+                "version": self.version}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM days")
+            self._conn.commit()
+            self.hits = self.misses = 0
@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import warnings
+import numpy as np
+import torch
+
+# 임베딩 인덱스에 함께 저장되는 상품 메타데이터 컬럼
+STORE_COLUMNS = ["name", "price", "brand", "image_url", "product_url"]
+
+# 통합 인덱스 등에서 추가로 붙는 선택 컬럼
+OPTIONAL_COLUMNS = ["category"]
+
+MMAP_FORMAT = "mmap-v1"
+
+def store_columns(store):
+    return STORE_COLUMNS + [col for col in OPTIONAL_COLUMNS if col in store]
+
+def to_matrix_store(data):
+    """
+    product_embeddings.py 결과 → {"embeddings": 정규화된 [N, D] 행렬, "name": [...], ...}
+    예전 형식(상품 dict 리스트)도 받아서 같은 행렬 형식으로 바꿔 준다.
+    """
+    if isinstance(data, dict):
+        return data
+    if not data:
+        return None
+    embeddings = torch.stack([torch.as_tensor(p["embedding"], dtype=torch.float32).cpu() for p in data])
+    store = {"embeddings": torch.nn.functional.normalize(embeddings, dim=1)}
+    for col in STORE_COLUMNS:
+        store[col] = [p.get(col, "") for p in data]
+    return store
+
+def mmap_paths(base_path):
+    """
+    cached_embeddings/food_3 → (food_3.f32 예전 고정 이름 행렬, food_3.json 메타데이터 사이드카)
+    새로 저장하는 행렬 파일 이름은 사이드카의 "matrix" 에 들어 있다 (matrix_path 참고).
+    """
+    return base_path + ".f32", base_path + ".json"
+
+def matrix_path(meta_path, meta):
+    if meta.get("matrix"):
+        return os.path.join(os.path.dirname(meta_path), meta["matrix"])
+    return os.path.splitext(meta_path)[0] + ".f32"
+
+def _read_meta(meta_path):
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _jsonable(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    if hasattr(value, "item"):
+        return _jsonable(value.item())
+    return str(value)
+
+def save_mmap_store(store, base_path):
+    """
+    행렬은 버전이 붙은 새 파일({base}.<버전>.f32, float32 row-major)에 쓰고, 그 이름을 담은 json 사이드카를
+    마지막에 교체한다. 로더는 사이드카가 가리키는 완성된 행렬만 읽으므로 새 행렬과 옛 메타데이터가 섞이지 않는다.
+    예전 행렬 파일은 사이드카를 바꾼 뒤 지운다 (이미 매핑한 프로세스는 계속 읽을 수 있다).
+    """
+    _, meta_path = mmap_paths(base_path)
+    try:
+        previous = matrix_path(meta_path, _read_meta(meta_path))
+    except (OSError, ValueError):
+        previous = None
+
+    embeddings = store["embeddings"].detach().cpu().to(torch.float32).contiguous().numpy()
+    rows, dim = embeddings.shape
+    new_matrix = f"{base_path}.{uuid.uuid4().hex[:12]}.f32"
+    embeddings.tofile(new_matrix)
+
+    meta = {
+        "format": MMAP_FORMAT,
+        "dtype": "float32",
+        "rows": rows,
+        "dim": dim,
+        "matrix": os.path.basename(new_matrix),
+        "columns": {col: [_jsonable(v) for v in store.get(col, [""] * rows)] for col in store_columns(store)},
+    }
+    # 임시 파일 이름에 pid → 여러 워커가 동시에 다시 변환해도 서로의 임시 파일을 덮어쓰지 않는다
+    tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_meta, meta_path)
+    if previous and previous != new_matrix and os.path.exists(previous):
+        os.remove(previous)
+    return new_matrix, meta_path
+
+def load_mmap_store(meta_path, retries=3):
+    """
+    json 사이드카 → 읽기 전용 memmap 위의 텐서. 여러 워커 프로세스가 같은 page cache를 공유한다.
+    행렬 파일 크기가 rows*dim*4 와 다르면(읽는 사이 다시 저장됨) 사이드카를 다시 읽고, 끝내 안 맞으면 ValueError.
+    """
+    for attempt in range(retries):
+        meta = _read_meta(meta_path)
+        if meta.get("format") != MMAP_FORMAT:
+            raise ValueError(f"지원하지 않는 임베딩 형식: {meta.get('format')} ({meta_path})")
+        path = matrix_path(meta_path, meta)
+        rows, dim = meta["rows"], meta["dim"]
+        expected = rows * dim * 4
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        if size == expected:
+            break
+        time.sleep(0.05 * (attempt + 1))
+    else:
+        raise ValueError(f"행렬 파일 크기 불일치: {path} ({size} != {expected}바이트, {meta_path})")
+
+    if rows == 0:
+        embeddings = torch.empty((0, dim), dtype=torch.float32)
+    else:
+        matrix = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dim))
+        with warnings.catch_warnings():
+            # 읽기 전용 매핑이라는 경고 (텐서에 쓰지 않으므로 무시)
+            warnings.simplefilter("ignore", UserWarning)
+            embeddings = torch.from_numpy(matrix)
+
+    store = {"embeddings": embeddings}
+    store.update(meta["columns"])
+    return store
+
+def convert_pt_to_mmap(pt_path):
+    store = to_matrix_store(torch.load(pt_path))
+    if store is None:
+        print(f"[!] {pt_path}: 비어 있음 → 건너뜀")
+        return None
+    base_path = os.path.splitext(pt_path)[0]
+    matrix_file, meta_path = save_mmap_store(store, base_path)
+    print(f"[✓] {pt_path} → {matrix_file} ({store['embeddings'].shape[0]}개) + {meta_path}")
+    return meta_path
+
+if __name__ == "__main__":
+    # 사용법: python embedding_store.py [cached_embeddings 폴더 또는 .pt 파일 ...]
+    targets = sys.argv[1:] or ["cached_embeddings"]
+    for target in targets:
+        if os.path.isdir(target):
+            for filename in sorted(os.listdir(target)):
+                if filename.endswith(".pt"):
+                    convert_pt_to_mmap(os.path.join(target, filename))
+        else:
+            convert_pt_to_mmap(target)
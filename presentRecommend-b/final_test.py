@@ -1,30 +1,32 @@
 import os
 import re
-import uuid
+import hashlib
+import threading
 import torch
-import pandas as pd
-from collections import defaultdict
-from keybert import KeyBERT
-from konlpy.tag import Okt
-from kobert_tokenizer import KoBERTTokenizer
-from transformers import BertForSequenceClassification, AutoTokenizer, BertModel
-from sentence_transformers import SentenceTransformer, util
+from collections import defaultdict, OrderedDict
 import torch.nn as nn
-
-# 모델 로드
+from embedding_store import to_matrix_store, load_mmap_store, save_mmap_store, convert_pt_to_mmap, mmap_paths, STORE_COLUMNS
+from ann_index import load_index
+from keyword_batch import extract_keywords_batch, phrase_cache
+from noun_extractor import get_okt, extract_nouns
+from batcher import MicroBatcher
+from inference_backend import convert_model, INFERENCE_BACKEND
+from message_cache import MessageCache, MESSAGE_CACHE_PATH, normalize_message, file_fingerprint
+from kakao_parser import iter_kakao_messages, extract_kakao_dialogues, is_valid_conversation
+from model_registry import registry
+from metrics import stage, MODEL_BATCH_SIZE, MODEL_BATCH_TOKENS
+
+# 모델은 import 시점이 아니라 registry.get(이름)으로 처음 쓸 때 로드한다 (서버는 시작 후 백그라운드 warmup).
 model_name = "skt/kobert-base-v1"
-tokenizer = KoBERTTokenizer.from_pretrained(model_name)
-interest_model = BertForSequenceClassification.from_pretrained(model_name, num_labels=2)
-interest_model.load_state_dict(torch.load("./kobert_importance.pth", map_location="cpu"))
-interest_model.eval()
-
-kw_model = KeyBERT(model="distiluse-base-multilingual-cased-v1")
-embedding_model = SentenceTransformer("jhgan/ko-sroberta-multitask")
-okt = Okt()
+INTEREST_CHECKPOINT = "./kobert_importance.pth"
+TOPIC_CHECKPOINT = "kobert_extended_with_subject.pth"
+KEYBERT_MODEL = "distiluse-base-multilingual-cased-v1"
+EMBEDDING_MODEL = "jhgan/ko-sroberta-multitask"
 
 class KoBertExtendedModel(nn.Module):
     def __init__(self, model_name="skt/kobert-base-v1", num_subjects=20):
         super().__init__()
+        from transformers import BertModel
         self.bert = BertModel.from_pretrained(model_name)
         self.score_head = nn.Linear(768, 1)
         self.awkward_head = nn.Linear(768, 2)
@@ -37,10 +39,53 @@ class KoBertExtendedModel(nn.Module):
         subject = self.subject_head(pooled_output)
         return score, awkward, subject
 
-topic_tokenizer = AutoTokenizer.from_pretrained("skt/kobert-base-v1", use_fast=False)
-topic_model = KoBertExtendedModel()
-topic_model.load_state_dict(torch.load("kobert_extended_with_subject.pth", map_location="cpu"), strict=False)
-topic_model.eval()
+def right_padded(tok):
+    # KoBERT 토크나이저(XLNet 계열)는 기본이 왼쪽 패딩이라 배치 안의 짧은 행은 0번 위치(풀러가 읽는 자리)와
+    # 위치 임베딩이 밀린다 → 배치 결과가 한 개씩 forward 한 결과와 같도록 오른쪽 패딩으로 고정
+    tok.padding_side = "right"
+    return tok
+
+def _load_tokenizer():
+    from kobert_tokenizer import KoBERTTokenizer
+    return right_padded(KoBERTTokenizer.from_pretrained(model_name))
+
+def _load_interest_model():
+    # onnx 계열 백엔드는 내보낸 그래프만 있으면 되므로 torch 가중치를 읽지 않는다
+    if INFERENCE_BACKEND.startswith("onnx"):
+        return convert_model(INFERENCE_BACKEND, "interest", None)
+    from transformers import BertForSequenceClassification
+    model = BertForSequenceClassification.from_pretrained(model_name, num_labels=2)
+    model.load_state_dict(torch.load(INTEREST_CHECKPOINT, map_location="cpu"))
+    model.eval()
+    return convert_model(INFERENCE_BACKEND, "interest", model)
+
+def _load_topic_tokenizer():
+    from transformers import AutoTokenizer
+    return right_padded(AutoTokenizer.from_pretrained(model_name, use_fast=False))
+
+def _load_topic_model():
+    if INFERENCE_BACKEND.startswith("onnx"):
+        return convert_model(INFERENCE_BACKEND, "topic", None)
+    model = KoBertExtendedModel()
+    model.load_state_dict(torch.load(TOPIC_CHECKPOINT, map_location="cpu"), strict=False)
+    model.eval()
+    return convert_model(INFERENCE_BACKEND, "topic", model)
+
+def _load_kw_model():
+    from keybert import KeyBERT
+    return KeyBERT(model=KEYBERT_MODEL)
+
+def _load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return convert_model(INFERENCE_BACKEND, "embedding", SentenceTransformer(EMBEDDING_MODEL))
+
+registry.register("tokenizer", _load_tokenizer)
+registry.register("interest_model", _load_interest_model)
+registry.register("topic_tokenizer", _load_topic_tokenizer)
+registry.register("topic_model", _load_topic_model)
+registry.register("kw_model", _load_kw_model)
+registry.register("embedding_model", _load_embedding_model)
+registry.register("okt", get_okt)
 
 subject_id2name = {0:"미용",1:"스포츠/레저",2:"교육",3:"가족",5:"영화/만화",6:"교통",7:"여행",
                    8:"회사/아르바이트",9:"건강",10:"연애/결혼",11:"게임",12:"계절/날씨",13:"방송/연예",
@@ -66,90 +111,458 @@ os.makedirs("cached_embeddings", exist_ok=True)
 with open("stopwords-ko.txt", encoding="utf-8") as f:
     stopwords = set(line.strip() for line in f if line.strip())
 
-def load_or_build_embeddings(category: str, intimacy_score: float):
-    csv_path = category_to_file.get(category)
-    if not csv_path:
-        return []
+def intimacy_suffix(intimacy_score: float):
     if intimacy_score < 2:
-        suffix = "_2"
+        return "_2"
     elif intimacy_score < 3:
-        suffix = "_3"
+        return "_3"
     elif intimacy_score < 4:
-        suffix = "_4"
-    else:
-        suffix = "_5"
+        return "_4"
+    return "_5"
+
+# 인덱스 파일 경로 → 로드된 임베딩 인덱스 LRU 캐시
+# 여러 (카테고리, 친밀도 구간)이 같은 파일({base}.pt 폴백 등)로 해석되면 한 번만 로드해 함께 쓴다.
+# 파일의 mtime/size가 바뀌었을 때만 다시 로드한다. 기본 크기 = prewarm 대상 전부 (카테고리 × 구간 4 + 통합 인덱스 4)
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", str(len(category_to_file) * 4 + 4)))
+_embedding_cache = OrderedDict()   # path → (path, mtime, size, store)
+_embedding_cache_lock = threading.Lock()
+embedding_cache_stats = {"hits": 0, "misses": 0, "reloads": 0, "evictions": 0}
+
+def _load_store_cached(path):
+    stat = os.stat(path)
+    with _embedding_cache_lock:
+        entry = _embedding_cache.get(path)
+        if entry and entry[1] == stat.st_mtime_ns and entry[2] == stat.st_size:
+            _embedding_cache.move_to_end(path)
+            embedding_cache_stats["hits"] += 1
+            return entry[3]
+        embedding_cache_stats["misses"] += 1
+        if entry:
+            embedding_cache_stats["reloads"] += 1
+
+    with stage("embedding_load", 1):
+        if path.endswith(".json"):
+            store = load_mmap_store(path)
+        else:
+            store = to_matrix_store(torch.load(path))
+
+    with _embedding_cache_lock:
+        _embedding_cache[path] = (path, stat.st_mtime_ns, stat.st_size, store)
+        _embedding_cache.move_to_end(path)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+            embedding_cache_stats["evictions"] += 1
+    return store
+
+def embedding_cache_info():
+    with _embedding_cache_lock:
+        return {**embedding_cache_stats, "size": len(_embedding_cache), "max_size": EMBEDDING_CACHE_SIZE,
+                "keys": list(_embedding_cache)}
+
+def clear_embedding_cache():
+    with _embedding_cache_lock:
+        _embedding_cache.clear()
+        for k in embedding_cache_stats:
+            embedding_cache_stats[k] = 0
+
+def prewarm_embedding_cache(categories=None):
+    """
+    서버 시작 시 모든 (카테고리, 친밀도 구간) 인덱스를 미리 메모리에 올려 둔다.
+    """
+    loaded = set()
+    for category in categories or category_to_file:
+        for score in (1, 2, 3, 4):
+            # 캐시 크기를 넘겨 가며 올리면 prewarm 한 인덱스를 스스로 밀어낸다
+            if len(loaded) >= EMBEDDING_CACHE_SIZE:
+                print(f"[!] 임베딩 캐시 prewarm: EMBEDDING_CACHE_SIZE({EMBEDDING_CACHE_SIZE})에 도달해 중단")
+                return len(loaded)
+            store = load_or_build_embeddings(category, score)
+            if store is not None:
+                loaded.add(id(store))
+    print(f"[✓] 임베딩 캐시 prewarm: 인덱스 {len(loaded)}개 로드 ({embedding_cache_info()['size']}개 캐시됨)")
+    return len(loaded)
+
+_convert_lock = threading.Lock()
+
+def resolve_store_path(base_path):
+    """
+    {base}.json (memmap 사이드카) 과 {base}.pt 중 읽을 파일 경로 (없으면 None).
+    memmap 은 .pt 보다 새로울 때만 쓰고, .pt 를 다시 빌드해 memmap 이 낡았으면 다시 변환한다.
+    사이드카는 행렬을 다 쓴 뒤 마지막에 바뀌므로 사이드카 mtime 이 memmap 의 버전이다.
+    """
+    _, meta_path = mmap_paths(base_path)
+    pt_path = base_path + ".pt"
+    has_mmap = os.path.exists(meta_path)
+    if not os.path.exists(pt_path):
+        return meta_path if has_mmap else None
+    if not has_mmap:
+        return pt_path
+    if os.path.getmtime(meta_path) >= os.path.getmtime(pt_path):
+        return meta_path
+    print(f"[!] {meta_path} 가 {pt_path} 보다 오래됨 → 다시 변환")
+    with _convert_lock:
+        try:
+            return convert_pt_to_mmap(pt_path) or pt_path
+        except OSError as e:
+            print(f"[!] {pt_path} → memmap 변환 실패 ({e}), .pt 사용")
+            return pt_path
+
+def load_or_build_embeddings(category: str, intimacy_score: float):
+    csv_path = category_to_file.get(category)
+    if not csv_path:
+        return None
+    suffix = intimacy_suffix(intimacy_score)
 
     base_name = os.path.splitext(os.path.basename(csv_path))[0]
-    cache_path = f"cached_embeddings/{base_name}{suffix}.pt"
-
-    if os.path.exists(cache_path):
-        return torch.load(cache_path)
-
-    fallback_path = f"cached_embeddings/{base_name}.pt"
-    if os.path.exists(fallback_path):
-        print(f"[!] {cache_path} 없음 → {fallback_path} 사용")
-        return torch.load(fallback_path)
-
-    print(f"[!] 캐시 없음: {cache_path} / {fallback_path}")
-    return []
-
-def classify_interest_batch(sentences):
-    inputs = tokenizer(
-        sentences,
-        return_tensors="pt",
-        padding=True,
-        truncation=True,
-        max_length=128
-    )
-    with torch.no_grad():
-        logits = interest_model(**inputs).logits
-        labels = torch.argmax(torch.softmax(logits, dim=1), dim=1)
-    return labels.tolist()
+    specific, generic = f"cached_embeddings/{base_name}{suffix}", f"cached_embeddings/{base_name}"
+
+    # 친밀도 구간별 인덱스가 있으면 (형식과 무관하게) 공용 인덱스보다 우선
+    path = resolve_store_path(specific)
+    if path:
+        return _load_store_cached(path)
+
+    path = resolve_store_path(generic)
+    if path:
+        if path.endswith(".pt"):
+            print(f"[!] {specific}.pt 없음 → {path} 사용")
+        return _load_store_cached(path)
+
+    print(f"[!] 캐시 없음: {specific}.pt / {generic}.pt")
+    return None
+
+# 전체 카테고리 통합 ANN 검색 (ann_index.py로 인덱스 빌드)
+CROSS_CATEGORY_SEARCH = os.environ.get("CROSS_CATEGORY_SEARCH", "0") == "1"
+ANN_NPROBE = int(os.environ.get("ANN_NPROBE", "8"))   # 클수록 recall↑, 지연↑
+
+def build_cross_category_store(intimacy_score: float):
+    """
+    모든 카테고리 인덱스를 하나로 합쳐 cached_embeddings/all_N.json (+ 버전이 붙은 .f32) 으로 저장 (category 컬럼 추가)
+    """
+    suffix = intimacy_suffix(intimacy_score)
+    parts = [(category, load_or_build_embeddings(category, intimacy_score)) for category in category_to_file]
+    parts = [(category, store) for category, store in parts if store is not None and len(store["name"])]
+    base_path = f"cached_embeddings/all{suffix}"
+    if not parts:
+        print(f"[!] {base_path}: 합칠 카테고리 인덱스 없음")
+        return base_path, None
+
+    store = {"embeddings": torch.cat([st["embeddings"] for _, st in parts]).float()}
+    for col in STORE_COLUMNS:
+        store[col] = [v for _, st in parts for v in st[col]]
+    store["category"] = [category for category, st in parts for _ in st["name"]]
+    save_mmap_store(store, base_path)
+    return base_path, store
+
+def load_cross_category_store(intimacy_score: float):
+    suffix = intimacy_suffix(intimacy_score)
+    base_path = f"cached_embeddings/all{suffix}"
+    _, meta_path = mmap_paths(base_path)
+    if not os.path.exists(meta_path):
+        print(f"[!] 통합 인덱스 없음: {meta_path} (python ann_index.py 로 생성)")
+        return None
+    store = _load_store_cached(meta_path)
+    if "ann" not in store:
+        store["ann"] = load_index(base_path, store["embeddings"].numpy(), store["name"])
+    return store
+
+# 모델별 배치 크기 (토큰 길이순으로 묶어 배치마다 최장 길이까지만 패딩)
+INTEREST_BATCH_SIZE = int(os.environ.get("INTEREST_BATCH_SIZE", "64"))
+TOPIC_BATCH_SIZE = int(os.environ.get("TOPIC_BATCH_SIZE", "8"))
+INTIMACY_BATCH_SIZE = int(os.environ.get("INTIMACY_BATCH_SIZE", "32"))   # 1이면 예전처럼 쌍마다 forward
+
+def sorted_batches(tok, texts, max_length, batch_size, model=None):
+    """
+    texts를 토큰 길이순으로 batch_size씩 묶어 (원래 인덱스, input_ids, attention_mask) 를 차례로 반환
+    model을 주면 배치 크기/패딩 길이를 메트릭에 기록
+    """
+    if getattr(tok, "padding_side", "right") != "right":
+        right_padded(tok)   # registry.override 로 바꿔 끼운 토크나이저도 같은 조건으로
+    input_ids = tok(texts, truncation=True, max_length=max_length)["input_ids"]
+    order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        batch = tok.pad({"input_ids": [input_ids[i] for i in idx]}, return_tensors="pt")
+        if model:
+            MODEL_BATCH_SIZE.observe(len(idx), model=model)
+            MODEL_BATCH_TOKENS.observe(batch["input_ids"].shape[1], model=model)
+        yield idx, batch["input_ids"], batch["attention_mask"]
+
+def classify_interest_batch(sentences, batch_size=None):
+    with stage("interest", len(sentences)):
+        if "interest" in model_batchers and batch_size is None:
+            return model_batchers["interest"].map(sentences)
+        return _classify_interest_direct(sentences, batch_size)
+
+def _classify_interest_direct(sentences, batch_size=None):
+    labels = [0] * len(sentences)
+    if not sentences:
+        return labels
+    for idx, input_ids, attention_mask in sorted_batches(registry.get("tokenizer"), sentences, 128, batch_size or INTEREST_BATCH_SIZE,
+                                                         "interest"):
+        with torch.no_grad():
+            logits = registry.get("interest_model")(input_ids=input_ids, attention_mask=attention_mask).logits
+        for i, label in zip(idx, torch.argmax(torch.softmax(logits, dim=1), dim=1).tolist()):
+            labels[i] = label
+    return labels
+
+def classify_topics(texts, batch_size=None):
+    """
+    하루치 대화 텍스트 리스트 → [(주제, 대분류), ...]
+    """
+    if "topic" in model_batchers and batch_size is None:
+        return model_batchers["topic"].map(texts)
+    return _classify_topics_direct(texts, batch_size)
+
+def _topic_logits_direct(texts, max_length=512, batch_size=None):
+    """
+    텍스트 리스트 → 주제 logits [N, 주제 수] (원래 순서)
+    """
+    rows = [None] * len(texts)
+    for idx, input_ids, attention_mask in sorted_batches(registry.get("topic_tokenizer"), texts, max_length,
+                                                         batch_size or TOPIC_BATCH_SIZE, "topic"):
+        with torch.no_grad():
+            _, _, subject_logits = registry.get("topic_model")(input_ids, attention_mask)
+        for i, row in zip(idx, subject_logits):
+            rows[i] = row
+    return rows
 
-def classify_topic(sentence):
-    inputs = topic_tokenizer(sentence, return_tensors="pt", padding=True, truncation=True, max_length=512)
-    with torch.no_grad():
-        _, _, subject_logits = topic_model(inputs["input_ids"], inputs["attention_mask"])
-        subject_id = torch.argmax(subject_logits, dim=1).item()
+def topic_name(subject_id):
     return subject_id2name.get(subject_id, "알 수 없음"), subject_to_main_category.get(subject_id, "없음")
 
-def classify_avg_score_from_pairs(messages):
-    if len(messages) < 2:
-        return 0.0
-    pairs = [(messages[i], messages[i + 1]) for i in range(len(messages) - 1)]
-    scores = []
-    for a, b in pairs:
-        input_text = a.strip() + " [SEP] " + b.strip()
-        inputs = topic_tokenizer(input_text, return_tensors="pt", padding=True, truncation=True, max_length=128)
+def _classify_topics_direct(texts, batch_size=None):
+    return [topic_name(int(torch.argmax(row))) for row in _topic_logits_direct(texts, 512, batch_size)]
+
+def classify_topic(sentence):
+    return classify_topics([sentence])[0]
+
+# 하루치 주제 분류 방식: truncate = 하루 대화를 이어 붙여 512토큰에서 자름 (기존)
+# window = 메시지 경계로 겹치는 창(TOPIC_WINDOW_TOKENS)을 만들어 한 배치로 추론하고 logits 평균
+TOPIC_MODE = os.environ.get("TOPIC_MODE", "truncate")
+TOPIC_WINDOW_TOKENS = int(os.environ.get("TOPIC_WINDOW_TOKENS", "256"))
+TOPIC_WINDOW_OVERLAP = int(os.environ.get("TOPIC_WINDOW_OVERLAP", "2"))   # 이웃 창과 겹치는 메시지 수
+TOPIC_MAX_WINDOWS = int(os.environ.get("TOPIC_MAX_WINDOWS", "8"))         # 하루당 창 상한 (지연 상한)
+TOPIC_MODES = ["truncate", "window"]
+
+def topic_windows(msgs, window_tokens=None, overlap=None, max_windows=None):
+    """
+    메시지 리스트 → 창 텍스트 리스트. 창마다 [CLS]/[SEP] 포함 window_tokens 이하가 되도록 메시지를 채우고,
+    다음 창은 앞 창의 마지막 overlap개 메시지부터 시작한다. 창이 max_windows개를 넘으면 하루 전체에 고르게 골라 쓴다.
+    """
+    window_tokens = window_tokens or TOPIC_WINDOW_TOKENS
+    overlap = TOPIC_WINDOW_OVERLAP if overlap is None else overlap
+    max_windows = max_windows or TOPIC_MAX_WINDOWS
+    if not msgs:
+        return []
+    budget = window_tokens - 2
+    lengths = [len(ids) for ids in registry.get("topic_tokenizer")(msgs, add_special_tokens=False)["input_ids"]]
+
+    windows = []
+    start = 0
+    while start < len(msgs):
+        end, used = start, 0
+        # 한 메시지가 예산보다 길면 그 메시지 하나로 창을 만든다 (추론 시 잘림)
+        while end < len(msgs) and (end == start or used + lengths[end] <= budget):
+            used += lengths[end]
+            end += 1
+        windows.append(" ".join(msgs[start:end]))
+        if end >= len(msgs):
+            break
+        start = max(end - overlap, start + 1)
+
+    if len(windows) > max_windows:
+        if max_windows == 1:
+            windows = windows[:1]
+        else:
+            step = (len(windows) - 1) / (max_windows - 1)
+            windows = [windows[round(i * step)] for i in range(max_windows)]
+    return windows
+
+def _window_logits(texts):
+    if "topic_window" in model_batchers:
+        return model_batchers["topic_window"].map(texts)
+    return _topic_logits_direct(texts, TOPIC_WINDOW_TOKENS)
+
+def classify_topics_windowed(days_msgs, max_windows=None):
+    """
+    날짜별 메시지 리스트의 리스트 → [(주제, 대분류), ...]. 모든 날짜의 창을 한 배치로 추론하고 날짜별로 logits 평균.
+    """
+    windows, spans = [], []
+    for msgs in days_msgs:
+        day_windows = topic_windows(msgs, max_windows=max_windows)
+        spans.append((len(windows), len(windows) + len(day_windows)))
+        windows.extend(day_windows)
+    logits = _window_logits(windows) if windows else []
+
+    results = []
+    for w0, w1 in spans:
+        if w0 == w1:
+            results.append(topic_name(-1))
+            continue
+        mean_logits = torch.stack(logits[w0:w1]).mean(dim=0)
+        results.append(topic_name(int(torch.argmax(mean_logits))))
+    return results
+
+def classify_day_topics(days_msgs, mode=None):
+    """
+    날짜별 메시지 리스트의 리스트 → [(주제, 대분류), ...] (TOPIC_MODE에 따라 자르기 또는 창 평균)
+    """
+    mode = mode or TOPIC_MODE
+    with stage("topic", len(days_msgs)):
+        if mode == "window":
+            return classify_topics_windowed(days_msgs)
+        if mode == "truncate":
+            return classify_topics([" ".join(msgs) for msgs in days_msgs])
+    raise ValueError(f"지원하지 않는 TOPIC_MODE: {mode} (가능: {', '.join(TOPIC_MODES)})")
+
+def intimacy_pair_texts(messages):
+    return [messages[i].strip() + " [SEP] " + messages[i + 1].strip() for i in range(len(messages) - 1)]
+
+def score_intimacy_texts(texts, batch_size=None):
+    """
+    (A [SEP] B) 텍스트 리스트 → 친밀도 점수 리스트 (원래 순서)
+    """
+    with stage("intimacy", len(texts)):
+        if "intimacy" in model_batchers and batch_size is None:
+            return model_batchers["intimacy"].map(texts)
+        return _score_intimacy_direct(texts, batch_size)
+
+def _score_intimacy_direct(texts, batch_size=None):
+    scores = [0.0] * len(texts)
+    if not texts:
+        return scores
+    for idx, input_ids, attention_mask in sorted_batches(registry.get("topic_tokenizer"), texts, 128, batch_size or INTIMACY_BATCH_SIZE,
+                                                         "intimacy"):
         with torch.no_grad():
-            score, _, _ = topic_model(inputs["input_ids"], inputs["attention_mask"])
-            score_value = torch.sigmoid(score).item() * 8
-            scores.append(score_value)
+            score, _, _ = registry.get("topic_model")(input_ids, attention_mask)
+        for i, value in zip(idx, torch.sigmoid(score).squeeze(-1).tolist()):
+            scores[i] = value * 8
+    return scores
+
+def score_intimacy_pairs(messages, batch_size=None):
+    """
+    인접 메시지 쌍 (A [SEP] B) 친밀도 점수를 원래 순서대로 반환
+    """
+    return score_intimacy_texts(intimacy_pair_texts(messages), batch_size)
+
+def average_intimacy(scores):
     return round(sum(scores) / len(scores), 2) if scores else 0.0
 
-def extract_kakao_dialogues(path):
-    with open(path, encoding="utf-8") as f:
-        lines = f.readlines()
-    data_by_date = defaultdict(list)
-    for line in lines:
-        if m := re.search(r"(\d{4})년 (\d{1,2})월 (\d{1,2})일", line):
-            y, m_, d = m.groups()
-            current_date = f"{int(y):04d}-{int(m_):02d}-{int(d):02d}"
-        elif re.search(r"[오전|오후]+\s*\d{1,2}:\d{2},\s*[^:]+:", line):
-            msg = re.sub(r"^\d{4}\. \d{1,2}\. \d{1,2}\. [오전|오후]+\s*\d{1,2}:\d{2},\s*[^:]+:\s*", "", line).strip()
-            if msg:
-                data_by_date[current_date].append(msg)
-    return data_by_date
-
-def is_valid_conversation(msg):
-    return bool(re.search(r"[가-힣]", msg)) and not re.search(r"https?://|총\s*금액", msg)
-
-def extract_interest_weighted_keywords(sentences):
+def classify_avg_score_from_pairs(messages, batch_size=None):
+    if len(messages) < 2:
+        return 0.0
+    return average_intimacy(score_intimacy_pairs(messages, batch_size))
+
+def _encode_queries_direct(queries):
+    return list(registry.get("embedding_model").encode(queries, convert_to_tensor=True, normalize_embeddings=True))
+
+def encode_query(query):
+    with stage("query_encode", 1):
+        if "embedding" in model_batchers:
+            return model_batchers["embedding"].submit(query).result()
+        return _encode_queries_direct([query])[0]
+
+# 동시 요청 간 마이크로 배칭: 모델별 큐에 입력을 모아 최대 배치 크기/최대 대기 시간 기준으로 한 번에 실행
+MICRO_BATCHING = os.environ.get("MICRO_BATCHING", "0") == "1"
+MICRO_BATCH_WAIT_MS = float(os.environ.get("MICRO_BATCH_WAIT_MS", "5"))
+model_batchers = {}
+if MICRO_BATCHING:
+    model_batchers = {
+        "interest": MicroBatcher("interest", lambda items: _classify_interest_direct(items),
+                                 INTEREST_BATCH_SIZE, MICRO_BATCH_WAIT_MS),
+        "topic": MicroBatcher("topic", lambda items: _classify_topics_direct(items),
+                              TOPIC_BATCH_SIZE, MICRO_BATCH_WAIT_MS),
+        "topic_window": MicroBatcher("topic_window", lambda items: _topic_logits_direct(items, TOPIC_WINDOW_TOKENS),
+                                     TOPIC_BATCH_SIZE * 2, MICRO_BATCH_WAIT_MS),
+        "intimacy": MicroBatcher("intimacy", lambda items: _score_intimacy_direct(items),
+                                 INTIMACY_BATCH_SIZE, MICRO_BATCH_WAIT_MS),
+        "embedding": MicroBatcher("embedding", _encode_queries_direct, 32, MICRO_BATCH_WAIT_MS),
+    }
+
+def batcher_stats():
+    return [batcher.stats() for batcher in model_batchers.values()]
+
+def extract_keywords_for_sentences(sentences):
+    """
+    문장별 KeyBERT 후보 [(구문, 점수), ...] — 문장 전체를 한 번에 임베딩하고 후보 구문 임베딩은 캐시 재사용
+    """
+    with stage("keybert", len(sentences)):
+        return extract_keywords_batch(registry.get("kw_model"), sentences, (1, 2), top_n=5)
+
+# 메시지 단위 추론 결과(관심 라벨, 명사, KeyBERT 후보) 영구 캐시. 관심 모델 체크포인트가 바뀌면 무효화.
+MESSAGE_CACHE_SCHEMA = 1
+MESSAGE_CACHE_ENABLED = os.environ.get("MESSAGE_CACHE", "1") == "1"
+_message_cache = None
+_message_cache_lock = threading.Lock()
+
+def get_message_cache():
+    """
+    처음 호출할 때 캐시를 연다 (버전 계산에 체크포인트 해시가 필요해 import 시점에는 열지 않음). 꺼져 있으면 None.
+    """
+    global _message_cache
+    if not MESSAGE_CACHE_ENABLED:
+        return None
+    with _message_cache_lock:
+        if _message_cache is None:
+            _message_cache = MessageCache(MESSAGE_CACHE_PATH,
+                                          f"v{MESSAGE_CACHE_SCHEMA}:{file_fingerprint(INTEREST_CHECKPOINT)}:{KEYBERT_MODEL}:{INFERENCE_BACKEND}")
+    return _message_cache
+
+def model_version():
+    """
+    분석 결과에 영향을 주는 모델 구성 (날짜 캐시 버전용)
+    """
+    return (f"{file_fingerprint(INTEREST_CHECKPOINT)}:{file_fingerprint(TOPIC_CHECKPOINT)}:"
+            f"{KEYBERT_MODEL}:{EMBEDDING_MODEL}:{INFERENCE_BACKEND}")
+
+def catalog_version():
+    """
+    상품 인덱스/CSV 파일 상태(이름, 크기, mtime) 해시 → 추천 결과 재사용 여부 판단용
+    """
+    digest = hashlib.sha1(f"cross={CROSS_CATEGORY_SEARCH}".encode())
+    for folder in ("cached_embeddings", "category_files"):
+        if not os.path.isdir(folder):
+            continue
+        for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+            if entry.is_file():
+                stat = entry.stat()
+                digest.update(f"{folder}/{entry.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+def analyze_messages(sentences):
+    """
+    문장 리스트 → (관심 라벨, KeyBERT 후보, 명사) 리스트 3개.
+    같은 메시지("ㅋㅋㅋ", "ㅇㅇ" ...)는 한 번만 추론하고, 이전 업로드에서 본 메시지는 캐시에서 가져온다.
+    """
+    keys = [normalize_message(sentence) for sentence in sentences]
+    unique = list(dict.fromkeys(keys))
+    message_cache = get_message_cache()
+    results = message_cache.get_many(unique) if message_cache else {}
+
+    missing = [key for key in unique if key not in results]
+    if missing:
+        labels = classify_interest_batch(missing)
+        keyword_lists = extract_keywords_for_sentences(missing)
+        noun_lists = extract_nouns(missing)
+        computed = {key: (label, tuple(nouns), keywords)
+                    for key, label, keywords, nouns in zip(missing, labels, keyword_lists, noun_lists)}
+        if message_cache:
+            message_cache.put_many(computed)
+        results.update(computed)
+
+    return ([results[key][0] for key in keys],
+            [results[key][2] for key in keys],
+            [results[key][1] for key in keys])
+
+def extract_interest_weighted_keywords(sentences, labels=None, keyword_lists=None, noun_lists=None):
     keyword_scores = defaultdict(float)
-    labels = classify_interest_batch(sentences)
-    for sentence, label in zip(sentences, labels):
-        nouns = {n for n in okt.nouns(sentence) if n not in stopwords and len(n) > 1}
-        for kw, score in kw_model.extract_keywords(sentence, (1, 2), None, top_n=5):
+    if labels is None or keyword_lists is None or noun_lists is None:
+        computed = analyze_messages(sentences)
+        labels = computed[0] if labels is None else labels
+        keyword_lists = computed[1] if keyword_lists is None else keyword_lists
+        noun_lists = computed[2] if noun_lists is None else noun_lists
+    for label, candidates, sentence_nouns in zip(labels, keyword_lists, noun_lists):
+        nouns = {n for n in sentence_nouns if n not in stopwords and len(n) > 1}
+        for kw, score in candidates:
             if all(tok in nouns for tok in kw.split()):
                 multiplier = 2.5 if " " in kw else 2.0
                 keyword_scores[kw] += score * (multiplier if label == 1 else 0.5)
@@ -159,45 +572,100 @@ def extract_interest_weighted_keywords(sentences):
     filtered = [(k, v) for k, v in keyword_scores.items() if all(not re.search(r"(다|어|지|음)$", t) for t in k.split())]
     return sorted(filtered, key=lambda x: x[1], reverse=True)
 
-def recommend_products_from_keywords(sorted_keywords, allowed_category, intimacy_score):
-    products = load_or_build_embeddings(allowed_category, intimacy_score)
-    if not products:
-        return []
+PRODUCT_ID_PATTERN = re.compile(r"/product/(\d+)")
 
-    query = " ".join([kw for kw, _ in sorted_keywords[:5]])
-    q_emb = embedding_model.encode(query, convert_to_tensor=True)
+def _present(value):
+    return value is not None and value == value and value != ""
 
-    ranked = sorted(
-        [(p, util.cos_sim(q_emb, p["embedding"]).item()) for p in products],
-        key=lambda x: x[1], reverse=True
-    )
+def product_id(name, product_url):
+    """
+    카카오 선물하기 상품 URL의 상품 번호 → 안정적인 id (없으면 상품명 해시)
+    """
+    if _present(product_url):
+        if m := PRODUCT_ID_PATTERN.search(str(product_url)):
+            return m.group(1)
+    return hashlib.sha1(str(name).encode("utf-8")).hexdigest()[:16]
 
-    csv_path = category_to_file.get(allowed_category)
-    df = pd.read_csv(csv_path)
+# 카테고리 CSV → {상품명: (가격, 이미지URL, 상품URL)}, 파일이 바뀔 때만 다시 읽는다.
+_catalog_lookup = {}
+_catalog_lookup_lock = threading.Lock()
+
+def load_catalog_lookup(category):
+    csv_path = category_to_file.get(category)
+    if not csv_path or not os.path.exists(csv_path):
+        return {}
+    mtime = os.stat(csv_path).st_mtime_ns
+    with _catalog_lookup_lock:
+        entry = _catalog_lookup.get(category)
+        if entry and entry[0] == mtime:
+            return entry[1]
+
+    import pandas as pd
+    with stage("catalog_csv"):
+        df = pd.read_csv(csv_path)
+        lookup = {}
+        for name, price, image_url, product_url in zip(df["상품명"], df["가격"], df["이미지URL"], df["상품URL"]):
+            lookup.setdefault(name, (price, image_url, product_url))
+
+    with _catalog_lookup_lock:
+        _catalog_lookup[category] = (mtime, lookup)
+    return lookup
+
+def product_record(store, idx, category):
+    """
+    인덱스에 함께 저장된 메타데이터로 응답 dict 생성. 예전 캐시처럼 URL이 비어 있으면 CSV 룩업으로 보충.
+    """
+    name = store["name"][idx]
+    price, image_url, product_url = store["price"][idx], store["image_url"][idx], store["product_url"][idx]
+    if not (_present(image_url) and _present(product_url)):
+        row = load_catalog_lookup(category).get(name)
+        if row:
+            price, image_url, product_url = row
+    return {
+        "id": product_id(name, product_url),
+        "name": name,
+        "category": category,
+        "imageUrl": image_url if _present(image_url) else None,
+        "price": price if _present(price) else "정보 없음",
+        "description": product_url if _present(product_url) else None
+    }
+
+def rank_products(store, query, top_k=5, nprobe=None):
+    """
+    쿼리 임베딩과 상품 행렬을 한 번의 행렬-벡터 곱으로 비교 → 상위 top_k (인덱스, 유사도)
+    store에 ANN 인덱스가 붙어 있으면 nprobe개 리스트만 근사 검색한다.
+    """
+    q_emb = encode_query(query)
+    with stage("rank", 1):
+        if store.get("ann") is not None:
+            ids, sims = store["ann"].search(q_emb.cpu().float().numpy(), top_k, nprobe or ANN_NPROBE)
+            return list(zip(ids.tolist(), sims.tolist()))
+        scores = store["embeddings"] @ q_emb.to(store["embeddings"].device, torch.float32)
+        k = min(top_k, scores.shape[0])
+        top = torch.topk(scores, k)
+        return list(zip(top.indices.tolist(), top.values.tolist()))
+
+def recommend_products_from_keywords(sorted_keywords, allowed_category, intimacy_score, cross_category=None):
+    with stage("recommend", 1):
+        return _recommend_products(sorted_keywords, allowed_category, intimacy_score, cross_category)
+
+def _recommend_products(sorted_keywords, allowed_category, intimacy_score, cross_category=None):
+    if cross_category is None:
+        cross_category = CROSS_CATEGORY_SEARCH
+    if cross_category:
+        store = load_cross_category_store(intimacy_score)
+    else:
+        store = load_or_build_embeddings(allowed_category, intimacy_score)
+    if store is None or len(store["name"]) == 0:
+        return []
+
+    query = " ".join([kw for kw, _ in sorted_keywords[:5]])
+    ranked = rank_products(store, query, top_k=5)
 
     results = []
-    for p, sim in ranked[:5]:
-        name = p["name"]
-        match = df[df["상품명"].str.contains(re.escape(name), na=False)]
-        if not match.empty:
-            row = match.iloc[0]
-            results.append({
-                "id": str(uuid.uuid4()),
-                "name": name,
-                "category": allowed_category,
-                "imageUrl": row["이미지URL"],
-                "price": row["가격"],
-                "description": row["상품URL"]
-            })
-        else:
-            results.append({
-                "id": str(uuid.uuid4()),
-                "name": name,
-                "category": allowed_category,
-                "imageUrl": None,
-                "price": "정보 없음",
-                "description": None
-            })
+    for idx, sim in ranked:
+        category = store["category"][idx] if "category" in store else allowed_category
+        results.append(product_record(store, idx, category))
     return results
 
 if __name__ == "__main__":
@@ -209,8 +677,7 @@ if __name__ == "__main__":
         if not msgs:
             continue
 
-        full_text = " ".join(msgs)
-        subject, main_cat = classify_topic(full_text)
+        subject, main_cat = classify_day_topics([msgs])[0]
         intimacy = classify_avg_score_from_pairs(msgs)
         keywords = extract_interest_weighted_keywords(msgs)
 
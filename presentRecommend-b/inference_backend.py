@@ -0,0 +1,156 @@
+import os
+import sys
+from types import SimpleNamespace
+import numpy as np
+import torch
+import torch.nn as nn
+
+# CPU 추론 백엔드 선택: torch(fp32) / int8(동적 양자화) / onnx / onnx-int8 (onnxruntime)
+# onnx 계열은 export_onnx()로 ONNX_DIR에 미리 내보낸 파일을 사용한다.
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+ONNX_DIR = os.environ.get("ONNX_DIR", "onnx_models")
+ONNX_THREADS = int(os.environ.get("ONNX_THREADS", "0"))   # 0이면 onnxruntime 기본값
+BACKENDS = ["torch", "int8", "onnx", "onnx-int8"]
+
+MODEL_FILES = {"interest": "interest.onnx", "topic": "topic.onnx", "embedding": "embedding.onnx"}
+
+def onnx_path(name, quantized=False, onnx_dir=ONNX_DIR):
+    path = os.path.join(onnx_dir, MODEL_FILES[name])
+    return path.replace(".onnx", ".int8.onnx") if quantized else path
+
+def quantize_int8(model):
+    """
+    nn.Linear 가중치를 int8로 동적 양자화 (활성값은 실행 시 양자화). 원본 모델은 그대로 둔다.
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+# ── ONNX 내보내기용 래퍼 ──
+class _InterestLogits(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+class _MeanPooledEncoder(nn.Module):
+    # ko-sroberta-multitask 의 pooling(토큰 평균)을 그래프 안에 포함
+    def __init__(self, transformer):
+        super().__init__()
+        self.transformer = transformer
+
+    def forward(self, input_ids, attention_mask):
+        hidden = self.transformer(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+        return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
+def _export(module, path, output_names, opset):
+    dummy_ids = torch.ones((2, 16), dtype=torch.long)
+    dummy_mask = torch.ones((2, 16), dtype=torch.long)
+    axes = {"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"}}
+    axes.update({name: {0: "batch"} for name in output_names})
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(module, (dummy_ids, dummy_mask), path, input_names=["input_ids", "attention_mask"],
+                          output_names=output_names, dynamic_axes=axes, opset_version=opset)
+    print(f"[✓] {path}")
+
+def export_onnx(interest_model, topic_model, embedding_model, onnx_dir=ONNX_DIR, opset=14, quantize=True):
+    """
+    세 모델을 ONNX로 내보내고, quantize=True면 onnxruntime 동적 int8 양자화본(*.int8.onnx)도 만든다.
+    """
+    os.makedirs(onnx_dir, exist_ok=True)
+    _export(_InterestLogits(interest_model), onnx_path("interest", onnx_dir=onnx_dir), ["logits"], opset)
+    _export(topic_model, onnx_path("topic", onnx_dir=onnx_dir), ["score", "awkward", "subject"], opset)
+    _export(_MeanPooledEncoder(embedding_model[0].auto_model), onnx_path("embedding", onnx_dir=onnx_dir),
+            ["sentence_embedding"], opset)
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        for name in MODEL_FILES:
+            quantize_dynamic(onnx_path(name, onnx_dir=onnx_dir), onnx_path(name, True, onnx_dir),
+                             weight_type=QuantType.QInt8)
+            print(f"[✓] {onnx_path(name, True, onnx_dir)}")
+
+# ── onnxruntime 실행 래퍼 (기존 torch 모델과 같은 호출 방식) ──
+class OnnxModel:
+    def __init__(self, path):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def run(self, input_ids, attention_mask):
+        feeds = {"input_ids": np.asarray(input_ids.cpu(), dtype=np.int64),
+                 "attention_mask": np.asarray(attention_mask.cpu(), dtype=np.int64)}
+        return [torch.from_numpy(out) for out in self.session.run(None, feeds)]
+
+    def eval(self):
+        return self
+
+class OnnxInterestModel(OnnxModel):
+    # BertForSequenceClassification 처럼 .logits 를 가진 결과 반환
+    def __call__(self, input_ids=None, attention_mask=None, **kwargs):
+        return SimpleNamespace(logits=self.run(input_ids, attention_mask)[0])
+
+class OnnxTopicModel(OnnxModel):
+    # KoBertExtendedModel 처럼 (score, awkward, subject) 반환
+    def __call__(self, input_ids, attention_mask):
+        return tuple(self.run(input_ids, attention_mask))
+
+class OnnxSentenceEncoder(OnnxModel):
+    # SentenceTransformer.encode 중 이 프로젝트가 쓰는 인자만 지원
+    def __init__(self, path, tokenizer, max_seq_length):
+        super().__init__(path)
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+
+    def encode(self, sentences, batch_size=32, convert_to_tensor=False, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        parts = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                   max_length=self.max_seq_length, return_tensors="pt")
+            parts.append(self.run(batch["input_ids"], batch["attention_mask"])[0])
+        embeddings = torch.cat(parts) if parts else torch.empty((0, 0))
+        if normalize_embeddings:
+            embeddings = torch.nn.functional.normalize(embeddings, dim=1)
+        if not convert_to_tensor:
+            embeddings = embeddings.numpy()
+        return embeddings[0] if single else embeddings
+
+def convert_model(backend, kind, model, onnx_dir=ONNX_DIR):
+    """
+    kind("interest" / "topic" / "embedding") 모델 하나를 선택한 백엔드로 바꿔 반환
+    """
+    if backend == "torch":
+        return model
+    if backend == "int8":
+        return quantize_int8(model)
+    if backend in ("onnx", "onnx-int8"):
+        path = onnx_path(kind, backend == "onnx-int8", onnx_dir)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"ONNX 모델 없음: {path} (python inference_backend.py 로 먼저 내보내기)")
+        if kind == "interest":
+            return OnnxInterestModel(path)
+        if kind == "topic":
+            return OnnxTopicModel(path)
+        return OnnxSentenceEncoder(path, model.tokenizer, model.max_seq_length)
+    raise ValueError(f"지원하지 않는 INFERENCE_BACKEND: {backend} (가능: {', '.join(BACKENDS)})")
+
+def apply_backend(backend, interest_model, topic_model, embedding_model, onnx_dir=ONNX_DIR):
+    """
+    선택한 백엔드로 바꾼 (interest_model, topic_model, embedding_model) 반환
+    """
+    return (convert_model(backend, "interest", interest_model, onnx_dir),
+            convert_model(backend, "topic", topic_model, onnx_dir),
+            convert_model(backend, "embedding", embedding_model, onnx_dir))
+
+if __name__ == "__main__":
+    # 사용법: INFERENCE_BACKEND=torch python inference_backend.py [출력 폴더]
+    os.environ["INFERENCE_BACKEND"] = "torch"
+    from final_test import registry
+    export_onnx(registry.get("interest_model"), registry.get("topic_model"), registry.get("embedding_model"),
+                sys.argv[1] if len(sys.argv) > 1 else ONNX_DIR)
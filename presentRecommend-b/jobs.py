@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import analyze_upload, recommend_upload
+
+# 비동기 작업: 분석/추천을 백그라운드 워커 풀에서 실행하고 진행 상황을 조회한다.
+# 작업 상태와 결과는 JOB_FOLDER/<jobId>.json 에 저장되어 서버를 재시작해도 남는다.
+JOB_FOLDER = os.environ.get("JOB_FOLDER", "jobs")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+os.makedirs(JOB_FOLDER, exist_ok=True)
+
+JOB_KINDS = {"analyze": analyze_upload, "recommendations": recommend_upload}
+PROGRESS_SAVE_INTERVAL = 1.0   # 진행률은 최대 1초에 한 번만 디스크에 기록
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+def _process_start(pid):
+    """
+    pid 재사용과 구분하기 위한 프로세스 시작 시각 (/proc/<pid>/stat 22번째 필드, 없으면 None)
+    """
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+def _owner():
+    return {"ownerPid": os.getpid(), "ownerStart": _process_start(os.getpid())}
+
+def _owner_alive(job):
+    """
+    작업을 맡은 프로세스가 아직 살아 있는지 (serve.py 의 다른 워커가 실행 중인 작업은 재개하면 안 된다)
+    """
+    pid = job.get("ownerPid")
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    start = _process_start(pid)
+    return start is None or start == job.get("ownerStart")
+
+def _job_path(job_id):
+    return os.path.join(JOB_FOLDER, job_id + ".json")
+
+def _save_job(job):
+    path = _job_path(job["jobId"])
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(job, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _update(job_id, save=True, **fields):
+    with _jobs_lock:
+        job = _jobs[job_id]
+        job.update(fields, updatedAt=time.time())
+        snapshot = dict(job)
+    if save:
+        _save_job(snapshot)
+
+def _run_job(job_id):
+    with _jobs_lock:
+        job = dict(_jobs[job_id])
+    _update(job_id, status="running", stage="start")
+    last_save = [0.0]
+    last_stage = [None]
+
+    def progress(stage, done, total):
+        now = time.time()
+        save = stage != last_stage[0] or now - last_save[0] >= PROGRESS_SAVE_INTERVAL
+        _update(job_id, save=save, stage=stage, done=done, total=total)
+        if save:
+            last_save[0], last_stage[0] = now, stage
+
+    try:
+        result, stats = JOB_KINDS[job["kind"]](job["fileId"], job["filePath"], job.get("recompute", False), progress)
+        _update(job_id, status="done", stage="done", result=result, incremental=stats)
+    except Exception as e:
+        print(f"[!] 작업 실패 {job_id}: {e}")
+        _update(job_id, status="failed", error=str(e))
+    # 끝난 작업은 디스크에서만 조회 (결과를 메모리에 계속 들고 있지 않음)
+    with _jobs_lock:
+        _jobs.pop(job_id, None)
+
+def submit_job(kind, file_id, file_path, recompute=False):
+    job = {
+        "jobId": str(uuid.uuid4()),
+        "kind": kind,
+        "fileId": file_id,
+        "filePath": file_path,
+        "recompute": recompute,
+        "status": "queued",
+        "stage": None,
+        "done": 0,
+        "total": 0,
+        "createdAt": time.time(),
+        "updatedAt": time.time(),
+        "result": None,
+        "error": None,
+        **_owner()
+    }
+    with _jobs_lock:
+        _jobs[job["jobId"]] = job
+    _save_job(job)
+    _executor.submit(_run_job, job["jobId"])
+    return job["jobId"]
+
+def get_job(job_id):
+    with _jobs_lock:
+        if job_id in _jobs:
+            return dict(_jobs[job_id])
+    path = _job_path(job_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def job_status(job):
+    """
+    응답용: 내부 경로는 숨기고 완료된 작업만 결과를 포함
+    """
+    status = {k: v for k, v in job.items() if k not in ("filePath", "result")}
+    if job["status"] == "done":
+        status["result"] = job["result"]
+    return status
+
+def resume_jobs():
+    """
+    서버 시작 시: 완료/실패한 작업은 그대로 두고, 재시작으로 끊긴 대기/실행 중 작업은 다시 큐에 넣는다.
+    맡은 프로세스가 살아 있는 작업(다른 워커가 실행 중)은 건너뛴다 → 재시작된 워커가 같은 작업을 두 번 돌리지 않는다.
+    """
+    resumed = 0
+    for filename in os.listdir(JOB_FOLDER):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(JOB_FOLDER, filename), encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if job.get("status") in ("queued", "running") and not _owner_alive(job):
+            job.update(status="queued", stage=None, done=0, total=0, **_owner())
+            with _jobs_lock:
+                _jobs[job["jobId"]] = job
+            _save_job(job)
+            _executor.submit(_run_job, job["jobId"])
+            resumed += 1
+    if resumed:
+        print(f"[✓] 중단된 작업 {resumed}개 재개")
+    return resumed
@@ -0,0 +1,50 @@
+import re
+from collections import defaultdict, namedtuple
+
+# 카카오톡 내보내기 파싱용 정규식 (미리 컴파일)
+DATE_HEADER_PATTERN = re.compile(r"(\d{4})년 (\d{1,2})월 (\d{1,2})일")
+MESSAGE_LINE_PATTERN = re.compile(r"[오전|오후]+\s*\d{1,2}:\d{2},\s*[^:]+:")
+MESSAGE_PREFIX_PATTERN = re.compile(r"^(\d{4})\. (\d{1,2})\. (\d{1,2})\. ([오전|오후]+)\s*(\d{1,2}):(\d{2}),\s*([^:]+):\s*")
+
+KakaoMessage = namedtuple("KakaoMessage", ["date", "speaker", "timestamp", "message"])
+
+def iter_kakao_messages(path):
+    """
+    카카오톡 내보내기 파일을 한 줄씩 읽어 KakaoMessage(date, speaker, timestamp, message)를 차례로 반환.
+    파일 전체를 메모리에 올리지 않는다. 형식이 다른 줄은 speaker/timestamp가 None.
+    """
+    current_date = None
+    date_strings = {}   # (년, 월, 일) → "YYYY-MM-DD" (같은 날짜 문자열을 매 줄 다시 만들지 않음)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if "년" in line and (m := DATE_HEADER_PATTERN.search(line)):
+                y, m_, d = m.groups()
+                current_date = f"{int(y):04d}-{int(m_):02d}-{int(d):02d}"
+                continue
+            if prefix := MESSAGE_PREFIX_PATTERN.match(line):
+                y, m_, d, ampm, hour, minute, speaker = prefix.groups()
+                if (y, m_, d) not in date_strings:
+                    date_strings[(y, m_, d)] = f"{int(y):04d}-{int(m_):02d}-{int(d):02d}"
+                hour = int(hour) % 12 + (12 if "후" in ampm else 0)
+                timestamp = f"{date_strings[(y, m_, d)]} {hour:02d}:{minute}"
+                speaker = speaker.strip()
+                msg = line[prefix.end():].strip()
+            elif MESSAGE_LINE_PATTERN.search(line):
+                speaker = timestamp = None
+                msg = line.strip()
+            else:
+                continue
+            if msg and current_date is not None:
+                yield KakaoMessage(current_date, speaker, timestamp, msg)
+
+def extract_kakao_dialogues(path):
+    data_by_date = defaultdict(list)
+    for record in iter_kakao_messages(path):
+        data_by_date[record.date].append(record.message)
+    return data_by_date
+
+HANGUL_PATTERN = re.compile(r"[가-힣]")
+INVALID_MESSAGE_PATTERN = re.compile(r"https?://|총\s*금액")
+
+def is_valid_conversation(msg):
+    return bool(HANGUL_PATTERN.search(msg)) and not INVALID_MESSAGE_PATTERN.search(msg)
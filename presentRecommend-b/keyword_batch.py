@@ -0,0 +1,96 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+
+# KeyBERT 기본 동작(후보 = 문서의 1~2-gram, 문서-후보 코사인 유사도 top_n)을 여러 문서에 한 번에 적용.
+# 예전 호출 kw_model.extract_keywords(sentence, (1, 2), None, top_n=5) 는 위치 인자라서 (1, 2) 가
+# candidates, None 이 keyphrase_ngram_range 로 들어가 CountVectorizer 가 실패하고 항상 [] 를 돌려줬다.
+# 여기서는 의도했던 extract_keywords(sentence, keyphrase_ngram_range=(1, 2), stop_words=None, top_n=5) 를 따른다
+# (train/keyword_extract.py 와 같은 호출, bench_suite.py 의 keywords 패리티로 확인).
+# 후보 구문 임베딩은 프로세스 전체에서 공유하는 LRU 캐시에 보관해 "생일 선물" 같은 구문은 한 번만 임베딩한다.
+
+CANDIDATE_CACHE_SIZE = int(os.environ.get("CANDIDATE_CACHE_SIZE", "50000"))
+
+class PhraseEmbeddingCache:
+    def __init__(self, max_size=CANDIDATE_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, backend, phrases):
+        """
+        구문 리스트 → [len(phrases), D] 임베딩. 캐시에 없는 구문만 한 번에 embed.
+        """
+        found, missing = {}, []
+        with self._lock:
+            for phrase in phrases:
+                if phrase in self._items:
+                    self._items.move_to_end(phrase)
+                    found[phrase] = self._items[phrase]
+                elif phrase not in found:
+                    missing.append(phrase)
+                    found[phrase] = None
+            self.hits += len(phrases) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            embedded = np.asarray(backend.embed(missing), dtype=np.float32)
+            with self._lock:
+                for phrase, vector in zip(missing, embedded):
+                    found[phrase] = vector
+                    self._items[phrase] = vector
+                while len(self._items) > self.max_size:
+                    self._items.popitem(last=False)
+        return np.stack([found[phrase] for phrase in phrases])
+
+    def info(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._items), "max_size": self.max_size}
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+phrase_cache = PhraseEmbeddingCache()
+
+def _normalize(x):
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+def extract_keywords_batch(kw_model, docs, keyphrase_ngram_range=(1, 2), top_n=5, cache=phrase_cache):
+    """
+    kw_model.extract_keywords(doc, keyphrase_ngram_range=keyphrase_ngram_range, stop_words=None, top_n=top_n) 를
+    docs 전체에 한 번에 수행.
+    반환: 문서별 [(구문, 유사도), ...] (유사도 내림차순, KeyBERT처럼 소수 4자리 반올림)
+    """
+    results = [[] for _ in docs]
+    if not docs:
+        return results
+    try:
+        vectorizer = CountVectorizer(ngram_range=keyphrase_ngram_range).fit(docs)
+    except ValueError:
+        # 모든 문서에 후보 구문이 없음 (KeyBERT도 빈 리스트 반환)
+        return results
+    vocab = vectorizer.get_feature_names_out()
+    counts = vectorizer.transform(docs).tocsr()
+
+    backend = kw_model.model
+    doc_embeddings = _normalize(np.asarray(backend.embed(list(docs)), dtype=np.float32))
+
+    used = np.unique(counts.indices)
+    vocab_embeddings = np.zeros((len(vocab), doc_embeddings.shape[1]), dtype=np.float32)
+    if len(used):
+        vocab_embeddings[used] = _normalize(cache.get_many(backend, [vocab[i] for i in used]))
+
+    for i in range(len(docs)):
+        candidates = counts.indices[counts.indptr[i]:counts.indptr[i + 1]]
+        if len(candidates) == 0:
+            continue
+        sims = vocab_embeddings[candidates] @ doc_embeddings[i]
+        top = np.argsort(-sims, kind="stable")[:top_n]
+        results[i] = [(vocab[candidates[j]], round(float(sims[j]), 4)) for j in top]
+    return results
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+# 메시지 내용 기반 추론 캐시: 정규화된 메시지 → (관심 라벨, 명사, KeyBERT 후보)
+# 업로드/사용자와 무관하게 재사용하고, 버전(체크포인트 해시 등)이 바뀌면 통째로 비운다.
+
+MESSAGE_CACHE_PATH = os.environ.get("MESSAGE_CACHE_PATH", "message_cache.sqlite3")
+MESSAGE_CACHE_MAX = int(os.environ.get("MESSAGE_CACHE_MAX", "500000"))
+
+def normalize_message(text):
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+_fingerprints = {}
+
+def file_fingerprint(path):
+    """
+    체크포인트 파일 sha256 앞 16자리 (size/mtime이 같으면 다시 계산하지 않음)
+    """
+    if not os.path.exists(path):
+        return "missing"
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _fingerprints:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _fingerprints[key] = digest.hexdigest()[:16]
+    return _fingerprints[key]
+
+class MessageCache:
+    def __init__(self, path, version, max_entries=MESSAGE_CACHE_MAX):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS messages ("
+                           "text TEXT PRIMARY KEY, label INTEGER, nouns TEXT, keywords TEXT, last_used REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_last_used ON messages (last_used)")
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != version:
+            if row is not None:
+                print(f"[!] 메시지 캐시 버전 변경 ({row[0]} → {version}) → 초기화")
+            self._conn.execute("DELETE FROM messages")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        self._conn.commit()
+
+    def get_many(self, texts):
+        """
+        정규화된 메시지 리스트 → {text: (label, nouns, keywords)} (캐시에 있는 것만)
+        """
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(texts), 500):
+                chunk = texts[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text, label, nouns, keywords FROM messages WHERE text IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                for text, label, nouns, keywords in rows:
+                    found[text] = (label, tuple(json.loads(nouns)), [tuple(kw) for kw in json.loads(keywords)])
+            if found:
+                self._conn.executemany("UPDATE messages SET last_used = ? WHERE text = ?", [(now, t) for t in found])
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, items):
+        """
+        items: {text: (label, nouns, keywords)}. 최대 개수를 넘으면 오래 안 쓴 것부터 삭제.
+        """
+        if not items:
+            return
+        now = time.time()
+        rows = [(text, int(label), json.dumps(list(nouns), ensure_ascii=False),
+                 json.dumps([list(kw) for kw in keywords], ensure_ascii=False), now)
+                for text, (label, nouns, keywords) in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?)", rows)
+            count = self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute("DELETE FROM messages WHERE text IN "
+                                   "(SELECT text FROM messages ORDER BY last_used LIMIT ?)", (count - self.max_entries,))
+            self._conn.commit()
+
+    def info(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size, "max_size": self.max_entries,
+                "version": self.version}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages")
+            self._conn.commit()
+            self.hits = self.misses = 0
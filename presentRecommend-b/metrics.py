@@ -0,0 +1,138 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Prometheus 텍스트 형식(0.0.4) 메트릭: 카운터/히스토그램을 프로세스 안에 모아 두고 /metrics 에서 그대로 내보낸다.
+# serve.py 멀티 워커 모드에서는 워커마다 따로 집계된다 (응답한 워커의 값, pid 라벨로 구분).
+
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+COUNT_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192]
+BYTES_BUCKETS = [1 << 10, 1 << 13, 1 << 16, 1 << 18, 1 << 20, 1 << 22, 1 << 24, 1 << 26, 1 << 28]
+
+_metrics = []
+_collectors = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = list(buckets) + [float("inf")]
+        self.labelnames = tuple(labelnames)
+        self._values = {}   # key → [버킷별 개수..., 합, 개수]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(entry)) for key, entry in self._values.items())
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(entry[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {entry[-1]}")
+        return lines
+
+def register_collector(collect):
+    """
+    collect() → [(이름, 타입, 도움말, [(라벨 dict, 값), ...]), ...]. /metrics 를 만들 때마다 호출 (캐시/배처 상태 등)
+    """
+    _collectors.append(collect)
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            families = collect()
+        except Exception as e:
+            print(f"[!] 메트릭 수집 실패: {e}")
+            continue
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+# ── 파이프라인 공용 메트릭 ──
+STAGE_SECONDS = Histogram("presentrec_stage_seconds", "Wall time per pipeline stage call", labelnames=["stage"])
+STAGE_ITEMS = Counter("presentrec_stage_items_total", "Items processed per pipeline stage", labelnames=["stage"])
+MODEL_BATCH_SIZE = Histogram("presentrec_model_batch_size", "Rows per model forward pass", COUNT_BUCKETS, ["model"])
+MODEL_BATCH_TOKENS = Histogram("presentrec_model_batch_tokens", "Padded sequence length per model forward pass",
+                               [8, 16, 32, 64, 128, 256, 512], ["model"])
+UPLOAD_BYTES = Histogram("presentrec_upload_bytes", "Decoded upload size in bytes", BYTES_BUCKETS)
+REQUEST_DATES = Histogram("presentrec_request_dates", "Dates per analysed upload", COUNT_BUCKETS)
+DATE_MESSAGES = Histogram("presentrec_date_messages", "Valid messages per date", COUNT_BUCKETS)
+REUSED_DATES = Counter("presentrec_dates_total", "Dates served from the day cache or recomputed", ["result"])
+HTTP_REQUESTS = Counter("presentrec_http_requests_total", "HTTP requests", ["endpoint", "method", "status"])
+HTTP_SECONDS = Histogram("presentrec_http_request_seconds", "HTTP request latency", labelnames=["endpoint"])
+
+@contextmanager
+def stage(name, items=None):
+    """
+    with stage("okt", len(sentences)): ... → 단계 소요 시간 히스토그램 + 처리 개수 카운터
+    """
+    with STAGE_SECONDS.time(stage=name):
+        yield
+    if items is not None:
+        STAGE_ITEMS.inc(items, stage=name)
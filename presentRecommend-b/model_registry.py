@@ -0,0 +1,74 @@
+import time
+import threading
+
+# 모델 레지스트리: 이름별 로더를 등록해 두고 처음 쓸 때 하나씩 로드한다.
+# import 시점에는 아무것도 로드하지 않으므로 파서/유틸만 쓰는 스크립트는 모델 비용을 내지 않는다.
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._load_seconds = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        if name in self._models:
+            return self._models[name]
+        with self._locks[name]:
+            if name not in self._models:
+                start = time.perf_counter()
+                try:
+                    model = self._loaders[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                self._load_seconds[name] = round(time.perf_counter() - start, 3)
+                self._errors.pop(name, None)
+                self._models[name] = model
+                print(f"[✓] 모델 로드: {name} ({self._load_seconds[name]}s)")
+        return self._models[name]
+
+    def override(self, name, model):
+        """
+        이미 만든 객체로 교체 (백엔드 비교 등). 이전 객체(없으면 None) 반환.
+        """
+        with self._locks[name]:
+            previous = self._models.get(name)
+            self._models[name] = model
+        return previous
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def ready(self, names=None):
+        return all(name in self._models for name in (names or self._loaders))
+
+    def warmup(self, names=None):
+        """
+        등록된(또는 지정한) 모델을 모두 로드하고 이름별 로드 시간(초) 반환
+        """
+        for name in names or list(self._loaders):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"[!] 모델 로드 실패: {name} → {e}")
+        return dict(self._load_seconds)
+
+    def status(self):
+        return {
+            name: {
+                "loaded": name in self._models,
+                "load_seconds": self._load_seconds.get(name),
+                "error": self._errors.get(name),
+            }
+            for name in self._loaders
+        }
+
+registry = ModelRegistry()
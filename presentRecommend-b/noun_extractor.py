@@ -0,0 +1,101 @@
+import os
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from konlpy.tag import Okt
+from metrics import stage
+
+# Okt 명사 추출: 문장 내용 기준 LRU 캐시 + 대량 업로드용 프로세스 풀
+# KoNLPy는 JVM 브리지를 거치므로 한 프로세스 안에서는 사실상 직렬 실행된다.
+# 워커는 spawn으로 띄워 각자 자기 JVM/Okt를 가진다 (JVM이 떠 있는 프로세스는 fork하면 안 됨).
+
+NOUN_CACHE_SIZE = int(os.environ.get("NOUN_CACHE_SIZE", "200000"))
+NOUN_WORKERS = int(os.environ.get("NOUN_WORKERS", "0"))   # 0이면 프로세스 풀 사용 안 함
+NOUN_POOL_MIN_SENTENCES = int(os.environ.get("NOUN_POOL_MIN_SENTENCES", "5000"))
+NOUN_POOL_CHUNK = 500
+
+_okt = None
+_okt_lock = threading.Lock()
+
+_noun_cache = OrderedDict()
+_noun_cache_lock = threading.Lock()
+noun_cache_stats = {"hits": 0, "misses": 0}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_okt():
+    global _okt
+    with _okt_lock:
+        if _okt is None:
+            _okt = Okt()
+        return _okt
+
+def _worker_init():
+    get_okt()
+
+def _worker_nouns(chunk):
+    okt = get_okt()
+    return [tuple(okt.nouns(sentence)) for sentence in chunk]
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_worker_init)
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+def _compute(sentences, workers):
+    if workers > 1 and len(sentences) >= NOUN_POOL_MIN_SENTENCES:
+        chunks = [sentences[i:i + NOUN_POOL_CHUNK] for i in range(0, len(sentences), NOUN_POOL_CHUNK)]
+        return [nouns for part in _get_pool(workers).map(_worker_nouns, chunks) for nouns in part]
+    okt = get_okt()
+    return [tuple(okt.nouns(sentence)) for sentence in sentences]
+
+def extract_nouns(sentences, workers=None):
+    """
+    문장 리스트 → 문장별 명사 튜플 리스트 (okt.nouns 와 같은 결과).
+    중복/이미 본 문장은 캐시에서 가져오고, 새 문장이 많으면 프로세스 풀로 나눠 처리한다.
+    """
+    workers = NOUN_WORKERS if workers is None else workers
+    found = {}
+    with _noun_cache_lock:
+        for sentence in sentences:
+            if sentence in found:
+                continue
+            if sentence in _noun_cache:
+                _noun_cache.move_to_end(sentence)
+                found[sentence] = _noun_cache[sentence]
+        missing = [sentence for sentence in dict.fromkeys(sentences) if sentence not in found]
+        noun_cache_stats["hits"] += len(sentences) - len(missing)
+        noun_cache_stats["misses"] += len(missing)
+
+    if missing:
+        with stage("okt", len(missing)):
+            computed = _compute(missing, workers)
+        with _noun_cache_lock:
+            for sentence, nouns in zip(missing, computed):
+                found[sentence] = nouns
+                _noun_cache[sentence] = nouns
+            while len(_noun_cache) > NOUN_CACHE_SIZE:
+                _noun_cache.popitem(last=False)
+    return [found[sentence] for sentence in sentences]
+
+def noun_cache_info():
+    with _noun_cache_lock:
+        return {**noun_cache_stats, "size": len(_noun_cache), "max_size": NOUN_CACHE_SIZE}
+
+def clear_noun_cache():
+    with _noun_cache_lock:
+        _noun_cache.clear()
+        for k in noun_cache_stats:
+            noun_cache_stats[k] = 0
@@ -0,0 +1,302 @@
+import os
+import json
+import threading
+from collections import defaultdict
+
+from day_cache import DayCache, DAY_CACHE_PATH, day_hash
+from metrics import stage, REQUEST_DATES, DATE_MESSAGES, REUSED_DATES
+
+from final_test import extract_kakao_dialogues, is_valid_conversation, classify_day_topics, classify_avg_score_from_pairs, extract_interest_weighted_keywords, recommend_products_from_keywords
+from final_test import TOPIC_MODE, model_version, catalog_version, intimacy_pair_texts, score_intimacy_texts, average_intimacy, analyze_messages
+
+# 파일별 분석 결과(JSON)를 저장해 /api/analyze 와 /api/recommendations 가 같이 쓴다.
+ANALYSIS_FOLDER = os.environ.get("ANALYSIS_FOLDER", "analysis")
+os.makedirs(ANALYSIS_FOLDER, exist_ok=True)
+
+# 분석 결과 형식/모델이 바뀌면 올려서 기존 결과를 무효화
+ANALYSIS_VERSION = 2
+STORED_KEYWORDS = 10
+
+# 업로드 전체의 주제/친밀도/관심 입력을 모아 큰 배치로 한 번에 추론 (0이면 날짜별로 추론)
+BATCHED_PIPELINE = os.environ.get("BATCHED_PIPELINE", "1") == "1"
+
+# 날짜별 내용 해시로 이전 업로드의 분석/추천 결과 재사용 (같은 방을 다시 내보낸 파일은 새 날짜만 추론)
+DAY_CACHE = os.environ.get("DAY_CACHE", "1") == "1"
+_day_cache = None
+_day_cache_lock = threading.Lock()
+
+def get_day_cache():
+    global _day_cache
+    if not DAY_CACHE:
+        return None
+    with _day_cache_lock:
+        if _day_cache is None:
+            _day_cache = DayCache(DAY_CACHE_PATH, f"v{ANALYSIS_VERSION}:{TOPIC_MODE}:{model_version()}")
+    return _day_cache
+
+_file_locks = defaultdict(threading.Lock)
+_file_locks_lock = threading.Lock()
+
+def _file_lock(file_id):
+    with _file_locks_lock:
+        return _file_locks[file_id]
+
+def day_result(date, subject, main_cat, intimacy, keywords):
+    return {
+        "date": date,
+        "subject": subject,
+        "category": main_cat,
+        "intimacy": intimacy,
+        "keywords": [[kw, score] for kw, score in keywords[:STORED_KEYWORDS]]
+    }
+
+def analyze_day(date, msgs):
+    subject, main_cat = classify_day_topics([msgs])[0]
+    intimacy = classify_avg_score_from_pairs(msgs)
+    keywords = extract_interest_weighted_keywords(msgs)
+    return day_result(date, subject, main_cat, intimacy, keywords)
+
+def _no_progress(stage, done, total):
+    pass
+
+def analyze_days_batched(dated_msgs, progress=_no_progress):
+    """
+    [(date, msgs), ...] 전체를 모델별로 한 번씩 배치 추론한 뒤 날짜별로 다시 나눈다.
+    날짜별 analyze_day 와 같은 결과를 낸다.
+    """
+    if not dated_msgs:
+        return []
+    total = len(dated_msgs)
+    progress("topic", 0, total)
+    topics = classify_day_topics([msgs for _, msgs in dated_msgs])
+
+    pair_texts, pair_spans = [], []
+    for _, msgs in dated_msgs:
+        texts = intimacy_pair_texts(msgs)
+        pair_spans.append((len(pair_texts), len(pair_texts) + len(texts)))
+        pair_texts.extend(texts)
+    progress("intimacy", 0, total)
+    pair_scores = score_intimacy_texts(pair_texts)
+
+    sentences, sentence_spans = [], []
+    for _, msgs in dated_msgs:
+        sentence_spans.append((len(sentences), len(sentences) + len(msgs)))
+        sentences.extend(msgs)
+    progress("messages", 0, total)
+    labels, keyword_lists, noun_lists = analyze_messages(sentences)
+
+    days = []
+    for (date, msgs), (subject, main_cat), (p0, p1), (s0, s1) in zip(dated_msgs, topics, pair_spans, sentence_spans):
+        intimacy = average_intimacy(pair_scores[p0:p1])
+        keywords = extract_interest_weighted_keywords(msgs, labels=labels[s0:s1], keyword_lists=keyword_lists[s0:s1],
+                                                      noun_lists=noun_lists[s0:s1])
+        days.append(day_result(date, subject, main_cat, intimacy, keywords))
+        progress("keywords", len(days), total)
+    return days
+
+def load_dated_messages(file_path):
+    dated_msgs = []
+    with stage("parse"):
+        for date, msgs in sorted(extract_kakao_dialogues(file_path).items()):
+            msgs = [m for m in msgs if is_valid_conversation(m)]
+            if msgs:
+                dated_msgs.append((date, msgs))
+    REQUEST_DATES.observe(len(dated_msgs))
+    for _, msgs in dated_msgs:
+        DATE_MESSAGES.observe(len(msgs))
+    return dated_msgs
+
+def _analyze_days(dated_msgs, batched=None, progress=_no_progress):
+    if BATCHED_PIPELINE if batched is None else batched:
+        return analyze_days_batched(dated_msgs, progress)
+    days = []
+    for date, msgs in dated_msgs:
+        days.append(analyze_day(date, msgs))
+        progress("analyze", len(days), len(dated_msgs))
+    return days
+
+def analyze_dated(dated_msgs, batched=None, progress=_no_progress, reuse=True):
+    """
+    [(date, msgs), ...] → (days, stats). 내용 해시가 날짜 캐시에 있는 날짜는 재사용하고 새로/바뀐 날짜만 추론한다.
+    """
+    hashes = [day_hash(date, msgs) for date, msgs in dated_msgs]
+    cache = get_day_cache()
+    cached = cache.get_many(hashes) if cache and reuse else {}
+    todo = [dm for dm, h in zip(dated_msgs, hashes) if h not in cached]
+    with stage("analyze", len(todo)):
+        computed = iter(_analyze_days(todo, batched, progress))
+
+    days, fresh = [], {}
+    for h in hashes:
+        if h in cached:
+            day = cached[h]
+        else:
+            day = next(computed)
+            day["hash"] = h
+            fresh[h] = day
+        days.append(day)
+    if cache:
+        cache.put_many(fresh)
+    REUSED_DATES.inc(len(days) - len(fresh), result="reused")
+    REUSED_DATES.inc(len(fresh), result="recomputed")
+    return days, {"dates": len(days), "reusedDates": len(days) - len(fresh), "recomputedDates": len(fresh)}
+
+def run_analysis(file_path, batched=None, progress=_no_progress, reuse=True):
+    """
+    progress(stage, done, total): 단계 이름과 처리한 날짜 수를 알려 주는 콜백 (비동기 작업 진행률용)
+    """
+    progress("parse", 0, 0)
+    return analyze_dated(load_dated_messages(file_path), batched, progress, reuse)
+
+def analysis_path(file_id):
+    return os.path.join(ANALYSIS_FOLDER, file_id + ".json")
+
+def _source_info(file_path):
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+def load_analysis(file_id, file_path):
+    """
+    저장된 분석 결과 → days 리스트. 버전이 다르거나 업로드 파일이 바뀌었으면 None.
+    """
+    path = analysis_path(file_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            artifact = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[!] 분석 결과 읽기 실패: {path} → {e}")
+        return None
+    if artifact.get("version") != ANALYSIS_VERSION or artifact.get("source") != _source_info(file_path) \
+            or artifact.get("topicMode", "truncate") != TOPIC_MODE:
+        return None
+    return artifact["days"]
+
+def save_analysis(file_id, file_path, days):
+    path = analysis_path(file_id)
+    artifact = {"fileId": file_id, "version": ANALYSIS_VERSION, "source": _source_info(file_path),
+                "topicMode": TOPIC_MODE, "days": days}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def invalidate_analysis(file_id):
+    path = analysis_path(file_id)
+    if os.path.exists(path):
+        os.remove(path)
+        return True
+    return False
+
+def get_or_run_analysis(file_id, file_path, recompute=False, progress=_no_progress):
+    """
+    저장된 분석 결과가 있으면 재사용, 없으면 파이프라인 실행(날짜 캐시에 없는 날짜만 추론) 후 저장 → (days, stats).
+    recompute=True면 날짜 캐시도 무시하고 모두 다시 계산한다. 같은 파일에 대한 동시 요청은 한 번만 계산한다.
+    """
+    with _file_lock(file_id):
+        if not recompute:
+            days = load_analysis(file_id, file_path)
+            if days is not None:
+                return days, {"dates": len(days), "reusedDates": len(days), "recomputedDates": 0}
+        days, stats = run_analysis(file_path, progress=progress, reuse=not recompute)
+        save_analysis(file_id, file_path, days)
+        return days, stats
+
+def day_summary(day):
+    return {
+        "date": day["date"],
+        "subject": day["subject"],
+        "category": day["category"],
+        "intimacy": day["intimacy"],
+        "keywords": [{"name": kw, "score": round(score, 2)} for kw, score in day["keywords"][:5]]
+    }
+
+def day_recommendations(day):
+    recs = recommend_products_from_keywords(
+        sorted_keywords=day["keywords"],
+        allowed_category=day["category"],
+        intimacy_score=day["intimacy"]
+    )
+    return {"date": day["date"], "recommendations": recs}
+
+def analyze_upload(file_id, file_path, recompute=False, progress=_no_progress):
+    """
+    → (날짜별 요약 리스트, 재사용/재계산 날짜 수)
+    """
+    days, stats = get_or_run_analysis(file_id, file_path, recompute, progress)
+    return [day_summary(day) for day in days], stats
+
+def iter_day_recommendations(days, stats=None):
+    """
+    day dict 들 → 날짜별 추천을 하나씩 반환. 상품 인덱스가 그대로면 날짜 캐시에 저장된 추천을 재사용하고,
+    새로 계산한 추천은 바로 캐시에 넣는다. stats(dict)를 넘기면 reusedRecommendations 를 누적한다.
+    """
+    cache = get_day_cache()
+    catalog = catalog_version() if cache else None
+    for day in days:
+        stored = cache.get_recommendations([day["hash"]], catalog) if cache else {}
+        if day["hash"] in stored:
+            _add_stats(stats, {"reusedRecommendations": 1})
+            yield {"date": day["date"], "recommendations": stored[day["hash"]]}
+            continue
+        item = day_recommendations(day)
+        if cache:
+            cache.put_recommendations({day["hash"]: item["recommendations"]}, catalog)
+        _add_stats(stats, {"reusedRecommendations": 0})
+        yield item
+
+def recommend_upload(file_id, file_path, recompute=False, progress=_no_progress):
+    """
+    → (날짜별 추천 리스트, 재사용/재계산 날짜 수). 상품 인덱스가 그대로면 날짜 캐시에 저장된 추천을 재사용한다.
+    """
+    days, stats = get_or_run_analysis(file_id, file_path, recompute, progress)
+    stats = dict(stats)
+    result = []
+    for item in iter_day_recommendations(days, stats):
+        result.append(item)
+        progress("recommend", len(result), len(days))
+    stats.setdefault("reusedRecommendations", 0)
+    return result, stats
+
+# 스트리밍: 처음엔 1일치만 처리해 첫 결과를 빨리 보내고, 이후 배치 크기를 STREAM_MAX_CHUNK까지 두 배씩 늘린다.
+STREAM_MAX_CHUNK = int(os.environ.get("STREAM_MAX_CHUNK", "16"))
+
+def _add_stats(stats, part):
+    if stats is not None:
+        for key, value in part.items():
+            stats[key] = stats.get(key, 0) + value
+
+def iter_analysis(file_id, file_path, recompute=False, stats=None):
+    """
+    날짜별 분석 결과(day dict)를 준비되는 대로 반환. 저장된 결과가 있으면 그대로 흘려보내고,
+    새로 계산한 경우 끝까지 소비되었을 때 저장한다. stats(dict)를 넘기면 재사용/재계산 날짜 수를 누적한다.
+    get_or_run_analysis 와 같은 파일 잠금을 잡으므로 같은 파일의 스트림/POST 는 한 번만 계산하고 저장한다
+    (클라이언트가 끊겨 제너레이터가 닫히면 잠금도 풀린다).
+    """
+    with _file_lock(file_id):
+        if not recompute:
+            days = load_analysis(file_id, file_path)
+            if days is not None:
+                _add_stats(stats, {"dates": len(days), "reusedDates": len(days), "recomputedDates": 0})
+                yield from days
+                return
+
+        dated_msgs = load_dated_messages(file_path)
+        days, chunk = [], 1
+        while len(days) < len(dated_msgs):
+            part = dated_msgs[len(days):len(days) + chunk]
+            part_days, part_stats = analyze_dated(part, batched=True, reuse=not recompute)
+            _add_stats(stats, part_stats)
+            for day in part_days:
+                days.append(day)
+                yield day
+            chunk = min(chunk * 2, STREAM_MAX_CHUNK)
+        save_analysis(file_id, file_path, days)
+
+def iter_summaries(file_id, file_path, recompute=False, stats=None):
+    for day in iter_analysis(file_id, file_path, recompute, stats):
+        yield day_summary(day)
+
+def iter_recommendations(file_id, file_path, recompute=False, stats=None):
+    yield from iter_day_recommendations(iter_analysis(file_id, file_path, recompute, stats), stats)
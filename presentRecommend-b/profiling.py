@@ -0,0 +1,140 @@
+import os
+import io
+import re
+import hmac
+import json
+import time
+import uuid
+import shutil
+import pstats
+import cProfile
+import itertools
+import threading
+from contextlib import contextmanager
+
+# 요청 단위 프로파일링: 요청 플래그/헤더로 켜거나 PROFILE_SAMPLE_N 개 중 1개를 골라
+# cProfile + torch profiler 로 실행하고 결과를 PROFILE_FOLDER/<id>/ 에 저장한다.
+# cProfile 은 요청을 처리한 스레드만 본다 (마이크로 배처 스레드의 forward 는 torch profiler 쪽에 잡힘).
+# 프로파일러는 프로세스에 하나만 켤 수 있으므로 이미 프로파일 중이면 그 요청은 건너뛴다.
+
+# 기본은 꺼짐: 켜면 클라이언트가 서버에서 프로파일러를 돌리고 결과 파일을 받아 갈 수 있으므로
+# 운영 환경에서는 PROFILE_TOKEN 을 함께 설정해 X-Profile-Token 헤더가 맞는 요청만 허용한다.
+PROFILING = os.environ.get("PROFILING", "0") == "1"
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_FOLDER = os.environ.get("PROFILE_FOLDER", "profiles")
+PROFILE_SAMPLE_N = int(os.environ.get("PROFILE_SAMPLE_N", "0"))   # 0이면 샘플링 안 함
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "50"))          # 보관할 최근 프로파일 수
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$")
+
+_profile_lock = threading.Lock()
+_request_counter = itertools.count(1)
+
+def authorized(token):
+    """
+    프로파일 요청/목록/다운로드 허용 여부 (PROFILING=1 이고, PROFILE_TOKEN 이 있으면 토큰 일치)
+    """
+    if not PROFILING:
+        return False
+    return not PROFILE_TOKEN or hmac.compare_digest(token or "", PROFILE_TOKEN)
+
+def profile_dir(profile_id):
+    if not PROFILE_ID_PATTERN.match(profile_id or ""):
+        return None
+    path = os.path.join(PROFILE_FOLDER, profile_id)
+    return path if os.path.isdir(path) else None
+
+def _should_profile(requested):
+    if not PROFILING:
+        return False, None
+    if requested:
+        return True, "requested"
+    if PROFILE_SAMPLE_N > 0 and next(_request_counter) % PROFILE_SAMPLE_N == 0:
+        return True, "sampled"
+    return False, None
+
+def _start_torch_profiler():
+    try:
+        from torch.profiler import profile, ProfilerActivity
+    except ImportError:
+        return None
+    prof = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+    prof.__enter__()
+    return prof
+
+def _save(path, profiler, torch_prof, meta):
+    os.makedirs(path, exist_ok=True)
+    profiler.dump_stats(os.path.join(path, "cprofile.prof"))
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(60)
+    with open(os.path.join(path, "cprofile.txt"), "w", encoding="utf-8") as f:
+        f.write(text.getvalue())
+    if torch_prof is not None:
+        torch_prof.export_chrome_trace(os.path.join(path, "torch_trace.json"))
+        with open(os.path.join(path, "torch_ops.txt"), "w", encoding="utf-8") as f:
+            f.write(torch_prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=40))
+    meta["files"] = sorted(os.listdir(path)) + ["meta.json"]
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+def _prune():
+    profiles = sorted(name for name in os.listdir(PROFILE_FOLDER) if PROFILE_ID_PATTERN.match(name))
+    for name in profiles[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        shutil.rmtree(os.path.join(PROFILE_FOLDER, name), ignore_errors=True)
+
+@contextmanager
+def profiled(label, requested=False, **context):
+    """
+    with profiled("analyze", requested, fileId=...) as info: ...
+    프로파일을 남겼으면 블록이 끝난 뒤 info["profileId"] 가 채워진다 (건너뛰었으면 info["profileSkipped"]).
+    """
+    info = {}
+    enabled, reason = _should_profile(requested)
+    if not enabled:
+        yield info
+        return
+    if not _profile_lock.acquire(blocking=False):
+        info["profileSkipped"] = "다른 요청을 프로파일링 중"
+        yield info
+        return
+    try:
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        profiler = cProfile.Profile()
+        torch_prof = _start_torch_profiler()
+        started_at, start = time.time(), time.perf_counter()
+        profiler.enable()
+        error = None
+        try:
+            yield info
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            profiler.disable()
+            if torch_prof is not None:
+                torch_prof.__exit__(None, None, None)
+            meta = {"profileId": profile_id, "label": label, "reason": reason, "startedAt": started_at,
+                    "seconds": round(time.perf_counter() - start, 4), "pid": os.getpid(), "error": error, **context}
+            try:
+                _save(os.path.join(PROFILE_FOLDER, profile_id), profiler, torch_prof, meta)
+                _prune()
+                info["profileId"] = profile_id
+                print(f"[✓] 프로파일 저장: {profile_id} ({label}, {meta['seconds']}s)")
+            except OSError as e:
+                print(f"[!] 프로파일 저장 실패: {e}")
+    finally:
+        _profile_lock.release()
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_FOLDER):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_FOLDER), reverse=True):
+        meta_path = os.path.join(PROFILE_FOLDER, name, "meta.json")
+        if not PROFILE_ID_PATTERN.match(name) or not os.path.exists(meta_path):
+            continue
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
@@ -0,0 +1,142 @@
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+import traceback
+
+# 멀티 워커 서빙 (pre-fork): 부모가 모델/임베딩을 한 번만 로드해 가중치를 공유 메모리로 옮긴 뒤
+# 워커를 fork한다. 워커는 가중치 페이지를 복사하지 않고 공유하며, 부모가 연 소켓에서 요청을 나눠 받는다.
+# 사용법: python serve.py [--workers 4] [--host 0.0.0.0] [--port 5000] [--threads N] [--no-preload]
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+import torch
+from werkzeug.serving import make_server
+import app
+from final_test import registry, prewarm_embedding_cache, _embedding_cache, INFERENCE_BACKEND
+
+# fork 이후에는 쓸 수 없는 모델: Okt(JVM 스레드), onnxruntime 세션(스레드 풀) → 워커마다 로드
+ONNX_MODELS = {"interest_model", "topic_model", "embedding_model"}
+
+def fork_unsafe_models():
+    names = {"okt"}
+    if INFERENCE_BACKEND.startswith("onnx"):
+        names |= ONNX_MODELS
+    return [name for name in registry.status() if name in names]
+
+def _modules(model):
+    if isinstance(model, torch.nn.Module):
+        yield model
+    # KeyBERT → 내부 SentenceTransformer
+    inner = getattr(getattr(model, "model", None), "embedding_model", None)
+    if isinstance(inner, torch.nn.Module):
+        yield inner
+
+def share_weights(names):
+    """
+    로드된 모델의 파라미터/버퍼와 .pt에서 읽은 상품 임베딩을 공유 메모리로 옮기고 옮긴 바이트 수 반환.
+    memmap 인덱스(.f32)는 이미 page cache를 공유하므로 그대로 둔다.
+    """
+    shared = 0
+    for name in names:
+        for module in _modules(registry.get(name)):
+            module.share_memory()
+            shared += sum(t.numel() * t.element_size() for t in module.state_dict().values() if isinstance(t, torch.Tensor))
+    for path, _, _, store in list(_embedding_cache.values()):
+        if path.endswith(".pt"):
+            store["embeddings"].share_memory_()
+            shared += store["embeddings"].numel() * store["embeddings"].element_size()
+    return shared
+
+def preload():
+    """
+    fork 전에 부모에서 실행: 모델 로드(추론은 하지 않음) → 공유 메모리 이동 → gc.freeze()
+    """
+    start = time.perf_counter()
+    unsafe = fork_unsafe_models()
+    names = [name for name in registry.status() if name not in unsafe]
+    app.startup["modelLoadSeconds"] = registry.warmup(names)
+    if app.PREWARM_EMBEDDINGS:
+        app.startup["embeddingsLoaded"] = prewarm_embedding_cache()
+    shared = share_weights(names)
+    app.startup["warmupSeconds"] = round(time.perf_counter() - start, 3)
+    # 이후 GC가 부모 객체 헤더를 건드려 copy-on-write 페이지 복사가 일어나지 않도록 영구 세대로 이동
+    gc.collect()
+    gc.freeze()
+    print(f"[✓] preload 완료: {', '.join(names)} ({shared / 2**20:.0f} MiB 공유, {app.startup['warmupSeconds']}s)")
+
+def listen(host, port, backlog=128):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(index, sock, host, port, threads, preloaded):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    torch.set_num_threads(threads)
+    # 부모에서 로드하지 않은 모델은 요청을 받기 전에 워커에서 로드
+    registry.warmup(fork_unsafe_models() if preloaded else None)
+    if not preloaded and app.PREWARM_EMBEDDINGS:
+        prewarm_embedding_cache()
+    # warmup은 위에서 끝냈으므로 생략, 중단된 작업은 0번 워커만 재개
+    # (다시 fork 된 0번 워커는 맡은 프로세스가 죽은 작업만 재개한다 → jobs.resume_jobs)
+    app.on_startup(resume=index == 0 and app.RESUME_JOBS, warmup_models=False)
+    server = make_server(host, port, app.app, threaded=True, fd=sock.fileno())
+    print(f"[✓] 워커 {index} (pid {os.getpid()}, torch 스레드 {threads}) 시작")
+    server.serve_forever()
+
+def serve(workers, host, port, threads=None, preloaded=True):
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    if preloaded:
+        preload()
+    sock = listen(host, port)
+    children = {}
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(index, sock, host, port, threads, preloaded)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(1)
+        children[pid] = index
+
+    def stop(signum, frame):
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(workers):
+        spawn(index)
+    print(f"[✓] http://{host}:{port} 워커 {workers}개 (preload={'on' if preloaded else 'off'})")
+
+    # 죽은 워커는 같은 번호로 다시 fork
+    while True:
+        pid, status = os.wait()
+        index = children.pop(pid, None)
+        if index is not None:
+            print(f"[!] 워커 {index} (pid {pid}) 종료 (status {status}) → 재시작")
+            time.sleep(1)
+            spawn(index)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_WORKERS", "4")))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=None, help="워커당 torch 스레드 수 (기본: CPU 수 / 워커 수)")
+    parser.add_argument("--no-preload", action="store_true", help="비교용: 워커마다 모델을 따로 로드")
+    args = parser.parse_args()
+    serve(args.workers, args.host, args.port, args.threads, not args.no_preload)
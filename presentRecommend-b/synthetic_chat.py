@@ -0,0 +1,75 @@
+import sys
+import random
+from datetime import date, timedelta
+
+# 벤치마크용 가짜 카카오톡 내보내기 파일 생성기 (extract_kakao_dialogues 가 읽는 형식 그대로)
+# 사용법: python synthetic_chat.py [출력 파일] [날짜 수] [하루 메시지 수] [참여자 수] [시드]
+
+WEEKDAYS = ["월요일", "화요일", "수요일", "목요일", "금요일", "토요일", "일요일"]
+SPEAKER_NAMES = ["토끼", "거북이", "다람쥐", "고양이", "강아지", "펭귄", "여우", "곰", "수달", "부엉이", "판다", "햄스터"]
+
+PRODUCTS = ["노트북 파우치", "무선 이어폰", "향수", "운동화", "텀블러", "립밤", "핸드크림", "캠핑 의자", "요가 매트",
+            "블루투스 스피커", "기계식 키보드", "머그컵", "목도리", "장갑", "디퓨저", "캔들", "에코백", "보조배터리",
+            "커피 원두", "초콜릿", "케이크", "꽃다발", "지갑", "시계", "안마기", "가습기", "전기포트", "강아지 간식"]
+TOPICS = ["시험", "회사", "여행", "영화", "게임", "날씨", "운동", "다이어트", "드라마", "아르바이트", "이사", "생일",
+          "주말", "콘서트", "맛집", "카페", "군대", "반려동물", "캠핑", "독서"]
+TEMPLATES = [
+    "요즘 {product} 하나 사고 싶어", "나 {product} 필요함", "이 {product} 어때?", "{product} 진짜 예쁘다",
+    "{product} 고장 나서 새로 사야 돼", "{topic} 때문에 너무 바빠", "오늘 {topic} 얘기 들었어?", "{topic} 끝나면 놀자",
+    "주말에 {topic} 어때", "{topic} 생각만 해도 피곤하다", "나 요즘 {topic}에 빠졌어", "{product} 선물 받으면 좋겠다",
+    "어제 {topic} 하고 왔는데 재밌었어", "{product} 어디서 샀어?", "다음 달에 {topic} 가기로 했어",
+]
+FILLERS = ["ㅋㅋㅋㅋ", "ㅇㅇ", "ㅎㅎ", "헐", "대박", "진짜?", "아 그렇구나", "좋아", "ㅠㅠ", "오키", "웅", "그니까"]
+NOISE = ["사진", "이모티콘", "https://gift.kakao.com/product/1234567", "총 금액 32,000원"]
+
+def random_message(rng):
+    roll = rng.random()
+    if roll < 0.35:
+        return rng.choice(FILLERS)
+    if roll < 0.38:
+        return rng.choice(NOISE)
+    text = rng.choice(TEMPLATES).format(product=rng.choice(PRODUCTS), topic=rng.choice(TOPICS))
+    # 가끔 긴 메시지 (여러 문장 이어 쓰기)
+    while rng.random() < 0.15:
+        text += " " + rng.choice(TEMPLATES).format(product=rng.choice(PRODUCTS), topic=rng.choice(TOPICS))
+    return text
+
+def kakao_time(hour, minute):
+    ampm = "오전" if hour < 12 else "오후"
+    return f"{ampm} {hour % 12 or 12}:{minute:02d}"
+
+def iter_export_lines(days=30, messages_per_day=100, speakers=2, seed=0, start=date(2024, 1, 1)):
+    rng = random.Random(seed)
+    names = SPEAKER_NAMES[:speakers] if speakers <= len(SPEAKER_NAMES) else \
+        [f"{SPEAKER_NAMES[i % len(SPEAKER_NAMES)]}{i}" for i in range(speakers)]
+    yield f"Talk_{start.year}.{start.month}.{start.day} 12:00.txt\n"
+    yield f"저장한 날짜 : {start.year}. {start.month}. {start.day}. 오후 12:00\n"
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        yield "\n"
+        yield f"{day.year}년 {day.month}월 {day.day}일 {WEEKDAYS[day.weekday()]}\n"
+        # 하루 메시지 수는 평균 messages_per_day 주변으로 흩어지게
+        n = max(1, int(rng.gauss(messages_per_day, messages_per_day * 0.3)))
+        minutes = sorted(rng.randrange(8 * 60, 24 * 60) for _ in range(n))
+        speaker = rng.choice(names)
+        for minute in minutes:
+            if rng.random() < 0.6:
+                speaker = rng.choice(names)
+            prefix = f"{day.year}. {day.month}. {day.day}. {kakao_time(minute // 60, minute % 60)}, {speaker} : "
+            yield prefix + random_message(rng) + "\n"
+
+def write_export(path, days=30, messages_per_day=100, speakers=2, seed=0):
+    lines = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for line in iter_export_lines(days, messages_per_day, speakers, seed):
+            f.write(line)
+            lines += 1
+    return lines
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "synthetic_chat.txt"
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    per_day = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    speakers = int(sys.argv[4]) if len(sys.argv) > 4 else 2
+    seed = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+    print(f"[✓] {path}: {write_export(path, days, per_day, speakers, seed)}줄")
@@ -0,0 +1,260 @@
+import os
+import zlib
+import uuid
+import struct
+import hashlib
+
+# 업로드 저장: 요청 본문을 받는 대로 (압축 해제 →) 해시 → 디스크 기록을 한 번에 처리한다.
+# 파일 id는 풀린 텍스트의 sha256 이므로 같은 대화 파일(.txt / .zip / .gz 무관)은 같은 id와 같은 분석 결과를 쓴다.
+# .zip / .gz 는 임시 파일 없이 스트림으로 풀고, 풀린 크기가 max_bytes 를 넘으면 즉시 중단한다.
+
+MAX_UPLOAD_MB = float(os.environ.get("MAX_UPLOAD_MB", "50"))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZIP_MAGIC = b"PK\x03\x04"
+
+class UploadTooLarge(Exception):
+    pass
+
+class UploadFormatError(Exception):
+    pass
+
+# 압축을 풀 때 한 번에 만드는 출력 상한: 네트워크 조각 하나가 수백 배로 부풀어도(압축 폭탄)
+# 이 크기씩 UploadSink 에 넘겨 크기 제한을 조각마다 확인한다.
+DECODE_CHUNK = 64 * 1024
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP64_EXTRA_ID = 0x0001
+
+def _inflate(inflater, data, emit):
+    """
+    data 를 DECODE_CHUNK 이하 조각으로 풀어 emit → 압축 스트림 끝에 닿았으면 남은 바이트(다음 항목), 아니면 None
+    """
+    while True:
+        out = inflater.decompress(data, DECODE_CHUNK)
+        emit(out)
+        if inflater.eof:
+            return inflater.unused_data
+        data = inflater.unconsumed_tail
+        # 입력을 다 썼어도 출력이 상한에 걸렸으면 zlib 안에 남은 출력이 있을 수 있다
+        if not data and len(out) < DECODE_CHUNK:
+            return None
+
+def _discard(data):
+    pass
+
+class GzipDecoder:
+    def __init__(self):
+        self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def feed(self, data, emit):
+        try:
+            while data:
+                # 여러 멤버로 이어 붙인 gzip
+                if self._inflater.eof:
+                    self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                data = _inflate(self._inflater, data, emit)
+        except zlib.error as e:
+            raise UploadFormatError(f"gzip 해제 실패: {e}")
+
+    def finish(self):
+        if not self._inflater.eof:
+            raise UploadFormatError("gzip 파일이 중간에 끝났습니다.")
+
+class ZipTextDecoder:
+    """
+    zip 로컬 헤더를 앞에서부터 읽어 첫 번째 .txt 항목만 풀어 낸다 (중앙 디렉터리/seek 불필요).
+    zip64 항목(크기 0xFFFFFFFF + zip64 extra, 24바이트 descriptor)은 지원하지 않는다.
+    """
+    HEADER = struct.Struct("<IHHHHHIIIHH")
+
+    def __init__(self):
+        self._buffer = b""
+        self._state = "header"
+        self._member = None
+        self._remaining = 0
+        self._inflater = None
+
+    def feed(self, data, emit):
+        self._buffer += data
+        try:
+            while self._step(emit):
+                pass
+        except zlib.error as e:
+            raise UploadFormatError(f"zip 해제 실패: {e}")
+
+    @staticmethod
+    def _is_zip64(comp_size, size, extra):
+        if ZIP64_MARKER in (comp_size, size):
+            return True
+        pos = 0
+        while pos + 4 <= len(extra):
+            header_id, length = struct.unpack_from("<HH", extra, pos)
+            if header_id == ZIP64_EXTRA_ID:
+                return True
+            pos += 4 + length
+        return False
+
+    def _step(self, emit):
+        if self._state == "done":
+            self._buffer = b""
+            return False
+        if self._state == "header":
+            if len(self._buffer) < 4:
+                return False
+            if self._buffer[:4] != ZIP_MAGIC:
+                raise UploadFormatError("zip 안에 .txt 대화 파일이 없습니다.")
+            if len(self._buffer) < self.HEADER.size:
+                return False
+            (_, _, flags, method, _, _, _, comp_size, size, name_len, extra_len) = self.HEADER.unpack_from(self._buffer)
+            end = self.HEADER.size + name_len + extra_len
+            if len(self._buffer) < end:
+                return False
+            name = self._buffer[self.HEADER.size:self.HEADER.size + name_len].decode("utf-8", "replace")
+            extra = self._buffer[self.HEADER.size + name_len:end]
+            self._buffer = self._buffer[end:]
+            if self._is_zip64(comp_size, size, extra):
+                raise UploadFormatError("zip64 형식은 지원하지 않습니다.")
+            if method not in (0, 8):
+                raise UploadFormatError(f"지원하지 않는 zip 압축 방식: {method}")
+            if method == 0 and flags & 0x08:
+                raise UploadFormatError("크기 정보가 없는 비압축 zip 항목은 지원하지 않습니다.")
+            self._member = {"name": name, "target": name.lower().endswith(".txt") and not name.startswith("__MACOSX"),
+                            "method": method, "descriptor": bool(flags & 0x08)}
+            self._remaining = None if flags & 0x08 else comp_size
+            self._inflater = zlib.decompressobj(-zlib.MAX_WBITS) if method == 8 else None
+            self._state = "data"
+            return True
+        if self._state == "data":
+            if not self._buffer:
+                return False
+            target = self._member["target"]
+            if self._remaining is not None:
+                chunk, self._buffer = self._buffer[:self._remaining], self._buffer[self._remaining:]
+                self._remaining -= len(chunk)
+                if target:
+                    if self._inflater:
+                        _inflate(self._inflater, chunk, emit)
+                    else:
+                        emit(chunk)
+                if self._remaining == 0:
+                    self._end_member(emit)
+                return True
+            # 크기를 모르는 deflate 항목: 스트림 끝(eof)까지 풀어 경계를 찾는다 (대상이 아니면 풀어서 버림)
+            rest = _inflate(self._inflater, self._buffer, emit if target else _discard)
+            if rest is not None:
+                self._buffer = rest
+                self._end_member(emit)
+            else:
+                self._buffer = b""
+            return True
+        if self._state == "descriptor":
+            if len(self._buffer) < 4:
+                return False
+            size = 16 if self._buffer[:4] == b"PK\x07\x08" else 12
+            if len(self._buffer) < size:
+                return False
+            self._buffer = self._buffer[size:]
+            self._state = "header"
+            return True
+        return False
+
+    def _end_member(self, emit):
+        if self._member["target"]:
+            if self._inflater:
+                emit(self._inflater.flush())
+            self._state = "done"
+        else:
+            self._state = "descriptor" if self._member["descriptor"] else "header"
+
+    def finish(self):
+        if self._state != "done":
+            raise UploadFormatError("zip 안에 .txt 대화 파일이 없습니다.")
+
+class UploadSink:
+    """
+    werkzeug가 업로드 파일 내용을 조각마다 write() 하는 대상. 형식은 첫 바이트(매직 넘버)로 판단한다.
+    """
+    def __init__(self, folder, max_bytes=MAX_UPLOAD_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.raw_size = 0
+        self.format = None
+        self._head = b""
+        self._decoder = None
+        self._digest = hashlib.sha256()
+        self._tmp_path = os.path.join(folder, f".upload-{uuid.uuid4().hex}.part")
+        self._file = open(self._tmp_path, "wb")
+
+    def write(self, data):
+        written = len(data)
+        self.raw_size += written
+        if self.format is None:
+            self._head += data
+            if len(self._head) < 4:
+                return written
+            data, self._head = self._head, b""
+            if data.startswith(GZIP_MAGIC):
+                self.format, self._decoder = "gzip", GzipDecoder()
+            elif data.startswith(ZIP_MAGIC):
+                self.format, self._decoder = "zip", ZipTextDecoder()
+            else:
+                self.format = "text"
+        try:
+            if self._decoder:
+                self._decoder.feed(data, self._emit)
+            else:
+                self._emit(data)
+        except UploadFormatError:
+            self.discard()
+            raise
+        return written
+
+    def _emit(self, data):
+        if not data:
+            return
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise UploadTooLarge(f"업로드 크기 제한({self.max_bytes // (1024 * 1024)}MB)을 넘었습니다.")
+        self._digest.update(data)
+        self._file.write(data)
+
+    def seek(self, offset, whence=0):
+        return 0
+
+    def finish(self):
+        """
+        업로드 완료 → (file_id, 이미 있던 파일인지). 같은 내용이 이미 있으면 새로 쓴 파일은 버린다.
+        """
+        if self.format is None:
+            self.format = "text"
+            self._emit(self._head)
+        elif self._decoder:
+            try:
+                self._decoder.finish()
+            except UploadFormatError:
+                self.discard()
+                raise
+        self._file.close()
+        if self.size == 0:
+            self.discard()
+            raise UploadFormatError("빈 파일입니다.")
+        file_id = self._digest.hexdigest()[:32]
+        path = os.path.join(self.folder, file_id + ".txt")
+        if os.path.exists(path):
+            os.remove(self._tmp_path)
+            return file_id, True
+        os.replace(self._tmp_path, path)
+        return file_id, False
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def close(self):
+        # werkzeug가 요청이 끝날 때 호출 (finish 전에 실패했으면 임시 파일 정리)
+        self.discard()